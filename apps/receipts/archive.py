@@ -0,0 +1,122 @@
+"""
+Streamed ZIP export of receipts with their images
+
+The archive is produced by zipfile writing into a pipe-like buffer that
+the response drains after every chunk, so neither the archive nor any
+image is held in memory or staged on disk. Entries use data descriptors
+(sizes after the data) and ZIP64 records, so accounts of any size stream
+in one pass. Images are already compressed and are stored as-is; the
+manifest is deflated and written last, so it can flag images whose files
+were missing when the archive was built.
+
+Layout:
+    images/<sha256>.<ext>        each referenced image once
+    receipts.csv                 one line per receipt, with its image path
+
+Receipts whose image is not in the archive have an empty image column and
+the original reference in missing_image: the blob path for a missing file,
+or image_url for legacy receipts that were never moved into the blob store.
+"""
+import logging
+import os
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+
+from .models import ImageBlob
+from .streaming import StreamBuffer, iter_csv
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'receipts.csv'
+MANIFEST_COLUMNS = (
+    'id', 'date', 'name', 'category', 'amount', 'notes',
+    'image_blob__sha256', 'image_blob__extension', 'image_url',
+)
+
+
+def image_name(sha256, extension):
+    return f'images/{sha256}.{extension}'
+
+
+def manifest_rows(rows, missing=None):
+    """Header and one line per receipt; missing maps sha256 to the path of images left out"""
+    missing = missing or {}
+    yield ['id', 'date', 'name', 'category', 'amount', 'notes', 'image', 'missing_image']
+    for receipt_id, receipt_date, name, category, amount, notes, sha256, extension, image_url in rows:
+        image = missing_image = ''
+        if sha256 and sha256 not in missing:
+            image = image_name(sha256, extension)
+        elif sha256:
+            missing_image = missing[sha256]
+        elif image_url:
+            missing_image = image_url
+        yield [
+            receipt_id,
+            receipt_date.isoformat() if receipt_date else '',
+            name,
+            category,
+            amount,
+            notes or '',
+            image,
+            missing_image,
+        ]
+
+
+def _entry(name, modified, compress_type):
+    info = zipfile.ZipInfo(name, modified.timetuple()[:6])
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def iter_zip(queryset, rows):
+    """
+    Yield a ZIP archive of the receipts in queryset as byte chunks.
+
+    Images come first from their own query, each distinct blob once;
+    rows is the (MANIFEST_COLUMNS) iterator for the manifest, read after
+    them so receipts whose image file was missing are flagged.
+    """
+    buffer = StreamBuffer()
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    missing = {}
+
+    with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+        blobs = (
+            ImageBlob.objects.filter(receipts__in=queryset.order_by().values('id'))
+            .distinct()
+            .order_by('sha256')
+            .only('sha256', 'extension', 'size', 'created_at')
+        )
+        for blob in blobs.iterator(chunk_size=settings.RECEIPTS_STREAM_CHUNK_SIZE):
+            full_path = os.path.join(settings.MEDIA_ROOT, blob.path)
+            try:
+                source = open(full_path, 'rb')
+            except OSError as e:
+                logger.warning('Skipping missing image %s in export: %s', blob.path, e)
+                missing[blob.sha256] = blob.path
+                continue
+
+            info = _entry(image_name(blob.sha256, blob.extension), blob.created_at, zipfile.ZIP_STORED)
+            # zipfile picks ZIP64 for this entry from the expected size
+            info.file_size = blob.size
+            with source, archive.open(info, 'w') as entry:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    entry.write(chunk)
+                    yield from buffer.drain()
+
+        # The manifest's size is unknown up front, so reserve ZIP64 fields for it
+        info = _entry(MANIFEST_NAME, datetime.now(), zipfile.ZIP_DEFLATED)
+        with archive.open(info, 'w', force_zip64=True) as entry:
+            for text in iter_csv(manifest_rows(rows, missing)):
+                entry.write(text.encode('utf-8'))
+                yield from buffer.drain()
+
+    # Central directory
+    yield from buffer.drain()
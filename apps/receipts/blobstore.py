@@ -0,0 +1,204 @@
+"""
+Content-addressed receipt image store
+
+Images live at MEDIA_ROOT/ab/cd/<sha256>.<ext>, so identical uploads share
+one file and no directory grows past a few thousand entries. ImageBlob
+rows count the receipts referencing each file; blobs that drop to zero
+references are reclaimed by `manage.py gc_image_blobs`.
+"""
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ImageBlob, Receipt
+
+
+BLOB_URL_RE = re.compile(r'^/uploads/([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})\.(\w+)$')
+
+
+def hash_file(path):
+    """SHA-256 hex digest and size of a file, read in upload-sized chunks"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def blob_for_url(url, user):
+    """
+    The blob an /uploads/ab/cd/<hash>.<ext> URL points to, or None.
+
+    Only blobs already attached to one of user's receipts resolve, so a
+    leaked URL or hash never grants access to someone else's image; new
+    images come in through the upload endpoints.
+    """
+    match = BLOB_URL_RE.match(url or '')
+    if not match:
+        return None
+    return ImageBlob.objects.filter(sha256=match.group(3), receipts__user=user).first()
+
+
+def store(path, sha256, extension, size):
+    """
+    Move a finished file into the store and return its ImageBlob.
+
+    The index row is upserted (and touched) before the file is put in
+    place. A concurrent GC holds the row locked while it moves the file
+    out of the way, so the upsert waits for it and the file we move in
+    afterwards is never removed from under the new reference.
+    """
+    table = connection.ops.quote_name(ImageBlob._meta.db_table)
+    now = timezone.now()
+    blob = list(ImageBlob.objects.raw(
+        f"INSERT INTO {table} "
+        f"(sha256, extension, size, ref_count, derivatives_status, touched_at, created_at) "
+        f"VALUES (%s, %s, %s, 0, %s, %s, %s) "
+        f"ON CONFLICT (sha256) DO UPDATE SET touched_at = EXCLUDED.touched_at "
+        f"RETURNING *",
+        [sha256, extension, size, ImageBlob.DERIVATIVES_PENDING, now, now],
+    ))[0]
+
+    target = os.path.join(settings.MEDIA_ROOT, blob.path)
+    if os.path.exists(target):
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+    return blob
+
+
+def acquire(blob, count=1):
+    """Record new references to a blob; run in the transaction that saves them"""
+    if blob is not None:
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            ref_count=F('ref_count') + count, touched_at=timezone.now()
+        )
+
+
+def release(blob_id, count=1):
+    """Drop references to a blob; it becomes collectable once none remain"""
+    if blob_id is not None:
+        ImageBlob.objects.filter(pk=blob_id).update(
+            ref_count=F('ref_count') - count, touched_at=timezone.now()
+        )
+
+
+def release_user(user_id):
+    """Drop every reference a user's receipts hold, in one statement"""
+    per_blob = Receipt.objects.filter(
+        user_id=user_id, image_blob=OuterRef('pk')
+    ).order_by().values('image_blob').annotate(n=Count('id')).values('n')
+    ImageBlob.objects.filter(
+        pk__in=Receipt.objects.filter(user_id=user_id, image_blob__isnull=False).values('image_blob')
+    ).update(
+        ref_count=F('ref_count') - Subquery(per_blob), touched_at=timezone.now()
+    )
+
+
+def recount():
+    """Reset every blob's ref_count from the receipts table; returns rows corrected"""
+    actual = Receipt.objects.filter(image_blob=OuterRef('pk')).order_by().values(
+        'image_blob'
+    ).annotate(n=Count('id')).values('n')
+    return ImageBlob.objects.annotate(
+        actual=Coalesce(Subquery(actual), 0)
+    ).exclude(ref_count=F('actual')).update(ref_count=Coalesce(Subquery(actual), 0))
+
+
+def _set_aside(blob):
+    """Move a blob's file and derivatives into IMAGE_BLOB_TRASH_DIR; returns (original, trash) pairs"""
+    trash_dir = os.path.join(settings.MEDIA_ROOT, settings.IMAGE_BLOB_TRASH_DIR)
+    os.makedirs(trash_dir, exist_ok=True)
+    moved = []
+    for relative in (blob.path, blob.derivative_path('thumb'), blob.derivative_path('preview')):
+        original = os.path.join(settings.MEDIA_ROOT, relative)
+        trash = os.path.join(trash_dir, f'{uuid.uuid4().hex}-{os.path.basename(relative)}')
+        try:
+            os.replace(original, trash)
+        except FileNotFoundError:
+            continue
+        # Dated now, so sweeping the trash leaves it alone until we commit
+        os.utime(trash)
+        moved.append((original, trash))
+    return moved
+
+
+def _unlink(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def collect(batch_size=500, grace=None):
+    """
+    Delete one batch of unreferenced blobs and their files.
+
+    Rows are locked with SKIP LOCKED, so several collectors can run at
+    once. Blobs that still have receipts are skipped whatever their
+    ref_count says. The rows are deleted first; the files are then moved
+    aside while the row locks are still held (so a concurrent store() of
+    the same content waits and then brings its own copy), unlinked once
+    the transaction commits, and put back if it fails. Returns the number
+    of blobs removed.
+    """
+    if grace is None:
+        grace = timedelta(seconds=settings.IMAGE_BLOB_GC_GRACE_SECONDS)
+    cutoff = timezone.now() - grace
+
+    moved = []
+    try:
+        with transaction.atomic():
+            blobs = list(
+                ImageBlob.objects.select_for_update(skip_locked=True)
+                .filter(ref_count__lte=0, touched_at__lt=cutoff)
+                .filter(~Exists(Receipt.objects.filter(image_blob=OuterRef('pk'))))
+                .order_by('touched_at')[:batch_size]
+            )
+            if not blobs:
+                return 0
+            ImageBlob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+            for blob in blobs:
+                moved.extend(_set_aside(blob))
+            trash = [path for _, path in moved]
+            transaction.on_commit(lambda: _unlink(trash))
+    except Exception:
+        for original, path in moved:
+            os.replace(path, original)
+        raise
+    return len(blobs)
+
+
+def sweep(directory, older_than):
+    """Delete files in MEDIA_ROOT/directory last modified more than older_than ago; returns how many"""
+    root = os.path.join(settings.MEDIA_ROOT, directory)
+    cutoff = time.time() - older_than.total_seconds()
+    removed = 0
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,120 @@
+"""
+Columnar receipt exports (Parquet and Arrow IPC) for dataframe users
+
+Rows are read from the database cursor in EXPORT_COLUMNAR_BATCH_SIZE
+batches and written as typed record batches: amount as decimal128, date
+as date32 and category dictionary-encoded. The category dictionary grows
+as categories appear in the rows, each batch extending the previous one's
+(a delta dictionary in Arrow IPC), so no separate query has to agree with
+the row cursor. pyarrow is optional; without it these formats are
+reported as unavailable.
+"""
+from django.conf import settings
+
+from .streaming import StreamBuffer
+
+
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+COLUMNAR_COLUMNS = ('id', 'date', 'name', 'category', 'amount', 'notes', 'created_at')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def available():
+    """Whether pyarrow is installed, so columnar exports can be produced"""
+    return _pyarrow() is not None
+
+
+def receipt_schema(pa):
+    from .models import Receipt
+
+    amount = Receipt._meta.get_field('amount')
+    return pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.date32()),
+        ('name', pa.string()),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('amount', pa.decimal128(amount.max_digits, amount.decimal_places)),
+        ('notes', pa.string()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+    ])
+
+
+def iter_batches(pa, schema, rows):
+    """Turn (COLUMNAR_COLUMNS) row tuples into record batches of EXPORT_COLUMNAR_BATCH_SIZE rows"""
+    # Codes are assigned on first sight and never change, so every batch's
+    # dictionary extends the one before it
+    categories = []
+    codes = {}
+    category_type = schema.field('category').type
+    batch_size = settings.EXPORT_COLUMNAR_BATCH_SIZE
+
+    def to_batch(columns):
+        dictionary = pa.array(categories, pa.string())
+        ids, dates, names, category_codes, amounts, notes, created = columns
+        return pa.record_batch([
+            pa.array(ids, pa.int64()),
+            pa.array(dates, pa.date32()),
+            pa.array(names, pa.string()),
+            pa.DictionaryArray.from_arrays(pa.array(category_codes, category_type.index_type), dictionary),
+            pa.array(amounts, schema.field('amount').type),
+            pa.array(notes, pa.string()),
+            pa.array(created, schema.field('created_at').type),
+        ], schema=schema)
+
+    columns = [[] for _ in COLUMNAR_COLUMNS]
+    for receipt_id, receipt_date, name, category, amount, note, created_at in rows:
+        columns[0].append(receipt_id)
+        columns[1].append(receipt_date)
+        columns[2].append(name)
+        code = codes.get(category)
+        if code is None:
+            code = codes[category] = len(categories)
+            categories.append(category)
+        columns[3].append(code)
+        columns[4].append(amount)
+        columns[5].append(note)
+        columns[6].append(created_at)
+        if len(columns[0]) >= batch_size:
+            yield to_batch(columns)
+            columns = [[] for _ in COLUMNAR_COLUMNS]
+    if columns[0]:
+        yield to_batch(columns)
+
+
+def iter_columnar(export_format, rows):
+    """
+    Yield a Parquet or Arrow IPC file of the receipts as byte chunks.
+
+    rows is an iterator of (COLUMNAR_COLUMNS) tuples; each record batch
+    is flushed to the caller as soon as it is written.
+    """
+    pa = _pyarrow()
+    schema = receipt_schema(pa)
+    buffer = StreamBuffer()
+
+    if export_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(buffer, schema, compression=settings.EXPORT_PARQUET_COMPRESSION)
+    elif export_format == 'arrow':
+        # New categories go out as delta dictionaries rather than replacements
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        writer = pa.ipc.new_file(buffer, schema, options=options)
+    else:
+        raise ValueError(f'Unknown columnar format: {export_format}')
+
+    for batch in iter_batches(pa, schema, rows):
+        # In Parquet each batch becomes one row group
+        writer.write_batch(batch)
+        yield from buffer.drain()
+
+    # Footer
+    writer.close()
+    yield from buffer.drain()
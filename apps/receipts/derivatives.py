@@ -0,0 +1,100 @@
+"""
+Receipt image derivatives
+
+Each stored image gets a thumbnail for lists, a preview for detail views
+and a tiny blurred placeholder (LQIP) inlined as a data: URI. They are
+rendered off the request path in a bounded background pool; blobs the
+pool skipped or lost stay pending until `manage.py
+generate_image_derivatives` picks them up.
+"""
+import base64
+import io
+import os
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from apps.users.versioning import bump_data_version
+from fint_backend.pools import get_pool
+
+from .models import ImageBlob, Receipt
+
+
+def derivative_pool():
+    return get_pool(
+        'image-derivatives',
+        settings.IMAGE_DERIVATIVE_WORKERS,
+        settings.IMAGE_DERIVATIVE_MAX_PENDING,
+    )
+
+
+def _save_webp(image, relative_path, quality):
+    """Write an image as WebP under MEDIA_ROOT, atomically"""
+    target = os.path.join(settings.MEDIA_ROOT, relative_path)
+    partial = f"{target}.part"
+    image.save(partial, 'WEBP', quality=quality, method=4)
+    os.replace(partial, target)
+
+
+def render(blob):
+    """Render a blob's derivatives to disk; returns (thumbnail, preview, placeholder)"""
+    preview_size = settings.IMAGE_PREVIEW_SIZE
+    quality = settings.IMAGE_DERIVATIVE_QUALITY
+
+    with Image.open(os.path.join(settings.MEDIA_ROOT, blob.path)) as source:
+        # Lets the JPEG decoder scale down while decoding, at a fraction of the cost
+        source.draft('RGB', (preview_size, preview_size))
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    # Each size is reduced from the previous one rather than from the original
+    image.thumbnail((preview_size, preview_size), Image.LANCZOS)
+    preview = blob.derivative_path('preview')
+    _save_webp(image, preview, quality)
+
+    image.thumbnail((settings.IMAGE_THUMBNAIL_SIZE, settings.IMAGE_THUMBNAIL_SIZE), Image.LANCZOS)
+    thumbnail = blob.derivative_path('thumb')
+    _save_webp(image, thumbnail, quality)
+
+    image.thumbnail((settings.IMAGE_PLACEHOLDER_SIZE, settings.IMAGE_PLACEHOLDER_SIZE), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=30)
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+    return thumbnail, preview, placeholder
+
+
+def generate(sha256, force=False):
+    """Render and record derivatives for one blob; returns its resulting status"""
+    blob = ImageBlob.objects.filter(sha256=sha256).first()
+    if blob is None:
+        return None
+    if blob.derivatives_status == ImageBlob.DERIVATIVES_READY and not force:
+        return blob.derivatives_status
+
+    try:
+        thumbnail, preview, placeholder = render(blob)
+    except Exception as e:
+        print(f"Error rendering derivatives for {sha256}: {e}")
+        ImageBlob.objects.filter(sha256=sha256).update(
+            derivatives_status=ImageBlob.DERIVATIVES_FAILED
+        )
+        return ImageBlob.DERIVATIVES_FAILED
+
+    ImageBlob.objects.filter(sha256=sha256).update(
+        derivatives_status=ImageBlob.DERIVATIVES_READY,
+        thumbnail=thumbnail,
+        preview=preview,
+        placeholder=placeholder,
+    )
+    # Receipt reads now include the derivative URLs, so refresh their ETags
+    user_ids = Receipt.objects.filter(image_blob_id=sha256).order_by().values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        bump_data_version(user_id)
+    return ImageBlob.DERIVATIVES_READY
+
+
+def schedule(blob):
+    """Queue derivative rendering for a newly stored blob, if the pool has room"""
+    if blob is not None and blob.derivatives_status != ImageBlob.DERIVATIVES_READY:
+        derivative_pool().submit(generate, blob.sha256)
@@ -0,0 +1,166 @@
+"""
+Background receipt export jobs
+
+POST /api/receipts/exports/ records a job; run_export_worker claims it
+with SELECT ... FOR UPDATE SKIP LOCKED, renders the export to a file under
+MEDIA_ROOT/exports/ and marks it done. A job is identified by its user,
+format, filters and the user's data version, so repeating a request
+before any receipt changes returns the existing job and artifact.
+Artifacts are deleted EXPORT_JOB_TTL_SECONDS after they finish.
+"""
+import hashlib
+import json
+import os
+import shutil
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.users.versioning import get_data_version
+
+from .exports import export_filename, export_queryset, render
+from .models import ExportJob
+
+
+def export_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'exports')
+
+
+def job_fingerprint(export_format, filters, data_version):
+    """Identity of an export's content: same inputs on the same data give the same file"""
+    payload = json.dumps([export_format, filters, data_version], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def delete_artifact(job):
+    """Remove a job's rendered file and its private directory"""
+    if job.file_path:
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, os.path.dirname(job.file_path)), ignore_errors=True)
+
+
+def request_export(user_id, export_format, filters):
+    """Return (job, created) for an export, reusing a live identical job"""
+    fingerprint = job_fingerprint(export_format, filters, get_data_version(user_id))
+    now = timezone.now()
+    live = ExportJob.objects.filter(user_id=user_id, fingerprint=fingerprint).exclude(
+        status=ExportJob.STATUS_FAILED
+    )
+
+    existing = live.first()
+    if existing is not None:
+        if existing.expires_at > now:
+            return existing, False
+        delete_artifact(existing)
+        existing.delete()
+
+    try:
+        with transaction.atomic():
+            job = ExportJob.objects.create(
+                user_id=user_id,
+                format=export_format,
+                filters=filters,
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=settings.EXPORT_JOB_TTL_SECONDS),
+            )
+    except IntegrityError:
+        # A concurrent identical request created it first
+        return live.get(), False
+    return job, True
+
+
+def claim_jobs(limit):
+    """Lease up to limit runnable jobs to this worker; returns their ids"""
+    now = timezone.now()
+    lease = timedelta(seconds=settings.EXPORT_JOB_LEASE_SECONDS)
+    with transaction.atomic():
+        # Running jobs whose lease lapsed belong to a worker that died
+        job_ids = list(
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING])
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .order_by('created_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if job_ids:
+            ExportJob.objects.filter(id__in=job_ids).update(
+                status=ExportJob.STATUS_RUNNING,
+                locked_until=now + lease,
+                attempts=F('attempts') + 1,
+            )
+    return job_ids
+
+
+def run_job(job_id):
+    """Render one claimed job to its artifact, recording progress as rows are written"""
+    job = ExportJob.objects.get(id=job_id)
+    filters = job.filters
+    lease = timedelta(seconds=settings.EXPORT_JOB_LEASE_SECONDS)
+
+    def progress(rows_done):
+        # Each report also extends the lease, so long renders are not reclaimed
+        ExportJob.objects.filter(id=job.id).update(
+            rows_done=rows_done, locked_until=timezone.now() + lease
+        )
+
+    relative_dir = os.path.join('exports', uuid.uuid4().hex)
+    target_dir = os.path.join(settings.MEDIA_ROOT, relative_dir)
+
+    # Every failure, setup included, counts against the job's attempts
+    try:
+        queryset = export_queryset(job.user_id, filters)
+        rows_total = queryset.count()
+        ExportJob.objects.filter(id=job.id).update(rows_total=rows_total, rows_done=0)
+
+        filename = export_filename(job.format, filters.get('start_date'), filters.get('end_date'))
+        os.makedirs(target_dir, exist_ok=True)
+        partial = os.path.join(target_dir, f'{filename}.part')
+        with open(partial, 'wb') as output:
+            render(job.format, queryset, filters, output, progress)
+        os.replace(partial, os.path.join(target_dir, filename))
+    except Exception:
+        shutil.rmtree(target_dir, ignore_errors=True)
+        failed = job.attempts >= settings.EXPORT_JOB_MAX_ATTEMPTS
+        ExportJob.objects.filter(id=job.id).update(
+            status=ExportJob.STATUS_FAILED if failed else ExportJob.STATUS_PENDING,
+            error=traceback.format_exc()[-2000:],
+            # Back off before the next attempt
+            locked_until=timezone.now() + timedelta(seconds=30 * job.attempts),
+        )
+        raise
+
+    now = timezone.now()
+    ExportJob.objects.filter(id=job.id).update(
+        status=ExportJob.STATUS_DONE,
+        rows_done=rows_total,
+        file_path=os.path.join(relative_dir, filename),
+        filename=filename,
+        size=os.path.getsize(os.path.join(target_dir, filename)),
+        error='',
+        locked_until=None,
+        finished_at=now,
+        expires_at=now + timedelta(seconds=settings.EXPORT_JOB_TTL_SECONDS),
+    )
+
+
+def cleanup_expired(limit=500):
+    """Delete expired jobs and their artifacts; returns how many were removed"""
+    jobs = list(
+        ExportJob.objects.filter(expires_at__lt=timezone.now())
+        .exclude(status=ExportJob.STATUS_RUNNING)
+        .order_by('expires_at')[:limit]
+    )
+    for job in jobs:
+        delete_artifact(job)
+    ExportJob.objects.filter(id__in=[job.id for job in jobs]).delete()
+    return len(jobs)
+
+
+def delete_user_exports(user_id):
+    """Remove every artifact a user's jobs left on disk"""
+    for job in ExportJob.objects.filter(user_id=user_id).exclude(file_path=''):
+        delete_artifact(job)
@@ -0,0 +1,196 @@
+"""
+Receipt export rendering
+
+Shared by the synchronous export endpoint and the export job worker.
+Every renderer reads receipts through a single ordered iterator and
+writes to a file-like object, reporting progress as rows go by.
+"""
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .archive import MANIFEST_COLUMNS, iter_zip
+from .columnar import COLUMNAR_COLUMNS, COLUMNAR_FORMATS, iter_columnar
+from .models import Receipt
+from .pagination import KEYSET_ORDERING
+from .pdf import write_pdf
+from .read_models import InvalidFields, ReceiptProjection
+from .streaming import iter_csv, iter_json_object
+
+
+EXPORT_FORMATS = ('csv', 'pdf', 'json', 'zip', 'parquet', 'arrow')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'pdf': 'application/pdf',
+    'json': 'application/json',
+    'zip': 'application/zip',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+# Columns read by the CSV and PDF exports, in row order
+EXPORT_COLUMNS = ('date', 'name', 'category', 'amount', 'notes')
+
+# Filters an export accepts, from query parameters or a job request
+FILTER_KEYS = ('category', 'start_date', 'end_date', 'fields')
+DATE_FILTER_KEYS = ('start_date', 'end_date')
+
+
+class InvalidFilters(ValueError):
+    """Raised when an export filter has the wrong type or an unparseable value"""
+
+
+def parse_filters(params):
+    """
+    Export filters from a query dict or JSON body; raises InvalidFilters.
+
+    Everything is checked here, before a job is queued, so the worker
+    never picks up a request it cannot run.
+    """
+    filters = {key: params.get(key) for key in FILTER_KEYS if params.get(key)}
+    for key, value in filters.items():
+        if not isinstance(value, str):
+            raise InvalidFilters(f'{key} must be a string')
+    for key in DATE_FILTER_KEYS:
+        if key in filters:
+            try:
+                date.fromisoformat(filters[key])
+            except ValueError:
+                raise InvalidFilters(f'{key} must be a date (YYYY-MM-DD)')
+    if 'fields' in filters:
+        try:
+            ReceiptProjection.from_param(filters['fields'])
+        except InvalidFields as e:
+            raise InvalidFilters(str(e)) from e
+    return filters
+
+
+def export_queryset(user_id, filters):
+    """A user's receipts matching the export filters, in export order"""
+    queryset = Receipt.objects.filter(user_id=user_id)
+
+    if filters.get('category'):
+        queryset = queryset.filter(category=filters['category'])
+
+    if filters.get('start_date'):
+        queryset = queryset.filter(date__gte=filters['start_date'])
+
+    if filters.get('end_date'):
+        queryset = queryset.filter(date__lte=filters['end_date'])
+
+    return queryset.order_by(*KEYSET_ORDERING)
+
+
+def export_filename(extension, start_date=None, end_date=None):
+    """Download name for an export, including its date range"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    # Add date range to filename if specified
+    date_range = ''
+    if start_date and end_date:
+        date_range = f'_{start_date}_to_{end_date}'
+    elif start_date:
+        date_range = f'_from_{start_date}'
+    elif end_date:
+        date_range = f'_to_{end_date}'
+
+    return f'receipts_export{date_range}_{timestamp}.{extension}'
+
+
+def iter_rows(queryset, columns=EXPORT_COLUMNS):
+    """Stream value tuples from the database in RECEIPTS_STREAM_CHUNK_SIZE batches"""
+    return queryset.values_list(*columns).iterator(chunk_size=settings.RECEIPTS_STREAM_CHUNK_SIZE)
+
+
+def counted(rows, progress, every=None):
+    """Pass rows through, calling progress(count) every `every` rows and at the end"""
+    if progress is None:
+        yield from rows
+        return
+    every = every or settings.RECEIPTS_STREAM_CHUNK_SIZE
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % every == 0:
+            progress(count)
+    progress(count)
+
+
+def csv_rows(rows):
+    """Header, one line per (date, name, category, amount, notes) row, then the total footer"""
+    yield ['Date', 'Name', 'Category', 'Amount', 'Notes']
+
+    # Accumulated as rows stream past, so no second query is needed
+    total = Decimal('0.00')
+    for receipt_date, name, category, amount, notes in rows:
+        yield [
+            receipt_date.isoformat() if receipt_date else '',
+            name,
+            category,
+            float(amount),
+            notes or ''
+        ]
+        total += amount
+
+    # Write summary
+    yield []
+    yield ['', '', 'Total:', float(total), '']
+
+
+def json_head(queryset):
+    """Summary fields placed before the streamed receipts array, computed in the database"""
+    summary = queryset.aggregate(total=Sum('amount'), count=Count('id'))
+    categories = queryset.order_by().values('category').annotate(total=Sum('amount'))
+
+    return {
+        'export_date': datetime.now().isoformat(),
+        'total_receipts': summary['count'],
+        'total_amount': float(summary['total'] or 0),
+        'by_category': {c['category']: float(c['total']) for c in categories},
+    }
+
+
+def render(export_format, queryset, filters, output, progress=None):
+    """Write a complete export in export_format to the binary file output"""
+    start_date = filters.get('start_date')
+    end_date = filters.get('end_date')
+
+    if export_format == 'pdf':
+        write_pdf(output, counted(iter_rows(queryset), progress), start_date, end_date)
+        return
+
+    if export_format == 'zip':
+        rows = counted(iter_rows(queryset, MANIFEST_COLUMNS), progress)
+        for chunk in iter_zip(queryset, rows):
+            output.write(chunk)
+        return
+
+    if export_format in COLUMNAR_FORMATS:
+        rows = counted(iter_rows(queryset, COLUMNAR_COLUMNS), progress)
+        for chunk in iter_columnar(export_format, rows):
+            output.write(chunk)
+        return
+
+    if export_format == 'csv':
+        chunks = iter_csv(csv_rows(counted(iter_rows(queryset), progress)))
+    elif export_format == 'json':
+        projection = ReceiptProjection.from_param(filters.get('fields'))
+        rows = projection.rows(queryset).iterator(chunk_size=settings.RECEIPTS_STREAM_CHUNK_SIZE)
+        chunks = iter_json_object(
+            json_head(queryset), 'receipts', counted(rows, progress), projection.to_dict
+        )
+    else:
+        raise ValueError(f'Unknown export format: {export_format}')
+
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    try:
+        for chunk in chunks:
+            text.write(chunk)
+        text.flush()
+    finally:
+        text.detach()
@@ -0,0 +1,52 @@
+"""
+Pillow image normalization
+
+Runs inside the ingest process pool, so it only depends on Pillow and the
+standard library and passes file paths rather than image bytes.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+
+def normalize_image(source, target, max_edge, output_format, quality):
+    """
+    Downscale an image to max_edge, strip its metadata and re-encode it to target.
+
+    output_format is 'webp' or 'jpeg' (progressive). Returns the new
+    (extension, size), or None when the original should be kept: animated
+    images, and files re-encoding would not shrink or clean up.
+    """
+    source_size = os.path.getsize(source)
+
+    with Image.open(source) as original:
+        if getattr(original, 'n_frames', 1) > 1:
+            return None
+        had_exif = bool(original.info.get('exif'))
+        icc_profile = original.info.get('icc_profile')
+        resized = max(original.size) > max_edge
+
+        # JPEG decodes at a reduced scale directly when a smaller size is asked for
+        original.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+
+    if output_format == 'webp':
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    else:
+        image = image.convert('RGB')
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    # EXIF is dropped by not passing it on; the colour profile is kept
+    if output_format == 'webp':
+        image.save(target, 'WEBP', quality=quality, method=4, icc_profile=icc_profile)
+        extension = 'webp'
+    else:
+        image.save(target, 'JPEG', quality=quality, optimize=True, progressive=True, icc_profile=icc_profile)
+        extension = 'jpg'
+
+    size = os.path.getsize(target)
+    if size >= source_size and not resized and not had_exif:
+        os.remove(target)
+        return None
+    return extension, size
@@ -0,0 +1,86 @@
+"""
+Ingest-time normalization of uploaded receipt images
+
+Before an upload is hashed and stored it is downscaled to
+IMAGE_MAX_EDGE, stripped of EXIF and re-encoded to IMAGE_INGEST_FORMAT in
+a process pool, so decoding and encoding never hold a web worker's GIL.
+The request thread waits for the result without the GIL, so under the
+threaded (gthread) workers the rest of the worker keeps serving; under
+sync workers the process is still tied up for the wait. When the pool is
+full, normalization fails or it takes longer than IMAGE_INGEST_TIMEOUT,
+the original is stored unchanged.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+
+from fint_backend import metrics
+from fint_backend.pools import get_pool
+
+from .imaging import normalize_image
+
+
+def ingest_pool():
+    return get_pool(
+        'image-ingest',
+        settings.IMAGE_INGEST_WORKERS,
+        settings.IMAGE_INGEST_MAX_PENDING,
+        processes=True,
+    )
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def normalize_upload(path, extension, size, staging_dir):
+    """
+    Normalize a staged upload; returns (path, extension, size) of the file to store.
+
+    The original is removed when a normalized copy replaces it.
+    """
+    if not settings.IMAGE_INGEST_ENABLED:
+        return path, extension, size
+
+    fd, target = tempfile.mkstemp(dir=staging_dir)
+    os.close(fd)
+
+    future = ingest_pool().submit(
+        normalize_image,
+        path,
+        target,
+        settings.IMAGE_MAX_EDGE,
+        settings.IMAGE_INGEST_FORMAT,
+        settings.IMAGE_INGEST_QUALITY,
+    )
+    if future is None:
+        metrics.increment('image_ingest_skipped')
+        os.remove(target)
+        return path, extension, size
+
+    try:
+        result = future.result(timeout=settings.IMAGE_INGEST_TIMEOUT)
+    except Exception as e:
+        print(f"Error normalizing image: {e!r}")
+        metrics.increment('image_ingest_failed')
+        future.cancel()
+        result = None
+
+    if result is None:
+        # A timed-out child may still write target, so remove it once the
+        # task has ended (at once if it already has)
+        future.add_done_callback(lambda _: _discard(target))
+        metrics.increment('image_ingest_kept_original')
+        return path, extension, size
+
+    new_extension, new_size = result
+    os.remove(path)
+    metrics.increment('image_ingest_normalized')
+    metrics.increment('image_ingest_bytes_in', size)
+    metrics.increment('image_ingest_bytes_out', new_size)
+    metrics.increment('image_ingest_bytes_saved', size - new_size)
+    return target, new_extension, new_size
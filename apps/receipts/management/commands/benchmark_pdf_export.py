@@ -0,0 +1,119 @@
+"""
+Measure PDF export time and peak memory at increasing row counts
+"""
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.receipts.exports import export_queryset, iter_rows
+from apps.receipts.models import Receipt
+from apps.receipts.pdf import write_pdf
+from apps.users.models import User
+
+
+class _Sink:
+    """Write-only file that keeps a byte count instead of the bytes"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def platypus_pdf(output, rows, start_date=None, end_date=None):
+    """The previous single-Table renderer, kept here as a baseline"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    doc = SimpleDocTemplate(output, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    data = [['Date', 'Name', 'Category', 'Amount', 'Notes']]
+    total = 0
+    for receipt_date, name, category, amount, notes in rows:
+        data.append([receipt_date.strftime('%Y-%m-%d'), name[:30], category, f"${float(amount):.2f}", (notes or '')[:20]])
+        total += float(amount)
+    data.append(['', '', '', f"${total:.2f}", 'TOTAL'])
+
+    table = Table(data, colWidths=[1.2*inch, 1.8*inch, 1.3*inch, 1*inch, 1.5*inch], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10b981')),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ]))
+    doc.build([table])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark PDF receipt export time and peak memory (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument(
+            '--baseline', action='store_true',
+            help='Also run the old single-Table renderer (slow at large row counts)',
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['rows'])
+        renderers = [('canvas (streaming)', write_pdf)]
+        if options['baseline']:
+            renderers.append(('platypus Table (baseline)', platypus_pdf))
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email='benchmark@fint.invalid', name='Benchmark', password=None
+            )
+            start = date(2020, 1, 1)
+            Receipt.objects.bulk_create(
+                (
+                    Receipt(
+                        user=user,
+                        name=f'Receipt {i} from a long merchant name',
+                        amount=Decimal('12.34'),
+                        category='Food & Dining',
+                        date=start + timedelta(days=i % 1500),
+                        notes='benchmark row with a longer note',
+                    )
+                    for i in range(sizes[-1])
+                ),
+                batch_size=1000,
+            )
+            queryset = export_queryset(user.id, {})
+
+            for rows in sizes:
+                self.stdout.write(f'{rows} rows')
+                for label, renderer in renderers:
+                    elapsed, peak, size = self._measure(renderer, queryset[:rows])
+                    self.stdout.write(
+                        f'  {label:<30} {elapsed:8.2f} s  {peak / 2**20:8.1f} MiB peak  '
+                        f'{size / 2**20:8.1f} MiB output'
+                    )
+
+            transaction.set_rollback(True)
+
+    def _measure(self, renderer, queryset):
+        # Timed separately: tracemalloc slows allocation-heavy code several times over
+        sink = _Sink()
+        started = time.perf_counter()
+        renderer(sink, iter_rows(queryset))
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        try:
+            renderer(_Sink(), iter_rows(queryset))
+            return elapsed, tracemalloc.get_traced_memory()[1], sink.size
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,79 @@
+"""
+Compare Receipt.to_dict() against the projected read model
+"""
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.receipts.models import Receipt
+from apps.receipts.read_models import ReceiptProjection
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-row CPU and memory of receipt read paths (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email='benchmark@fint.invalid', name='Benchmark', password=None
+            )
+            start = date(2020, 1, 1)
+            Receipt.objects.bulk_create(
+                [
+                    Receipt(
+                        user=user,
+                        name=f'Receipt {i}',
+                        amount=Decimal('12.34'),
+                        category='Food & Dining',
+                        date=start + timedelta(days=i % 1500),
+                        notes='benchmark row',
+                    )
+                    for i in range(rows)
+                ],
+                batch_size=1000,
+            )
+            queryset = Receipt.objects.filter(user=user)
+
+            full = ReceiptProjection()
+            narrow = ReceiptProjection.from_param('id,amount,date')
+            cases = [
+                ('model.to_dict()', lambda: [r.to_dict() for r in queryset.all()]),
+                ('projection (all fields)', lambda: [full.to_dict(r) for r in full.rows(queryset)]),
+                ('projection (id,amount,date)', lambda: [narrow.to_dict(r) for r in narrow.rows(queryset)]),
+            ]
+
+            self.stdout.write(f'{rows} rows, best of {repeat}')
+            for label, run in cases:
+                best = min(self._timed(run) for _ in range(repeat))
+                peak = self._peak_memory(run)
+                self.stdout.write(
+                    f'  {label:<30} {best / rows * 1e6:8.2f} us/row  '
+                    f'{peak / rows:8.0f} B/row peak'
+                )
+
+            transaction.set_rollback(True)
+
+    def _timed(self, run):
+        started = time.perf_counter()
+        run()
+        return time.perf_counter() - started
+
+    def _peak_memory(self, run):
+        tracemalloc.start()
+        try:
+            run()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
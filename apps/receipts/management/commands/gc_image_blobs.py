@@ -0,0 +1,53 @@
+"""
+Reclaim receipt images no receipt references any more
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.receipts import blobstore
+from apps.receipts.uploads import INCOMING_DIR
+
+
+class Command(BaseCommand):
+    help = 'Delete unreferenced image blobs in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Blobs deleted per transaction')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument(
+            '--grace-seconds',
+            type=int,
+            default=settings.IMAGE_BLOB_GC_GRACE_SECONDS,
+            help='Only collect blobs unreferenced for at least this long',
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Recompute reference counts from receipts before collecting',
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            corrected = blobstore.recount()
+            self.stdout.write(f'Corrected {corrected} reference counts')
+
+        grace = timedelta(seconds=options['grace_seconds'])
+        removed = 0
+        batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            count = blobstore.collect(options['batch_size'], grace)
+            if not count:
+                break
+            removed += count
+            batches += 1
+
+        # Left behind by collectors that died between commit and unlink
+        blobstore.sweep(settings.IMAGE_BLOB_TRASH_DIR, grace)
+        # Staging files of uploads whose requests died
+        stale = blobstore.sweep(INCOMING_DIR, grace)
+        if stale:
+            self.stdout.write(f'Removed {stale} abandoned upload files')
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} unreferenced images'))
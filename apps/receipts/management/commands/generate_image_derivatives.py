@@ -0,0 +1,57 @@
+"""
+Render thumbnails, previews and placeholders for stored receipt images
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.receipts import derivatives
+from apps.receipts.models import ImageBlob
+
+
+def _generate(sha256, force):
+    try:
+        return derivatives.generate(sha256, force)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Backfill image derivatives for blobs that are pending (or failed, with --retry-failed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_DERIVATIVE_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry failed blobs')
+        parser.add_argument('--all', action='store_true', help='Regenerate every blob, e.g. after changing sizes')
+
+    def handle(self, *args, **options):
+        statuses = [ImageBlob.DERIVATIVES_PENDING]
+        if options['retry_failed']:
+            statuses.append(ImageBlob.DERIVATIVES_FAILED)
+
+        blobs = ImageBlob.objects.order_by('sha256')
+        if not options['all']:
+            blobs = blobs.filter(derivatives_status__in=statuses)
+
+        results = Counter()
+        last = ''
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            while True:
+                # Keyset batches, so rows whose status changes don't shift the window
+                batch = list(
+                    blobs.filter(sha256__gt=last).values_list('sha256', flat=True)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last = batch[-1]
+                for status in executor.map(_generate, batch, [options['all']] * len(batch)):
+                    results[status] += 1
+                self.stdout.write(f'Processed {sum(results.values())} images')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{results[ImageBlob.DERIVATIVES_READY]} ready, {results[ImageBlob.DERIVATIVES_FAILED]} failed"
+        ))
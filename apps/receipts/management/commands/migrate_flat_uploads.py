@@ -0,0 +1,68 @@
+"""
+Move images from the flat uploads directory into the content-addressed store
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.receipts import blobstore
+from apps.receipts.models import Receipt
+from apps.receipts.uploads import SNIFF_BYTES, incoming_dir, sniff_image_type
+
+
+class Command(BaseCommand):
+    help = (
+        'Move files at the top level of MEDIA_ROOT into the sharded image store and '
+        'repoint their receipts. Safe to re-run; unreferenced files are left for gc_image_blobs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Stop after this many files')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would move')
+
+    def handle(self, *args, **options):
+        moved = skipped = 0
+
+        with os.scandir(settings.MEDIA_ROOT) as entries:
+            for entry in entries:
+                if options['limit'] is not None and moved >= options['limit']:
+                    break
+                if not entry.is_file() or entry.name.startswith('.'):
+                    continue
+
+                with open(entry.path, 'rb') as f:
+                    extension = sniff_image_type(f.read(SNIFF_BYTES))
+                if extension is None:
+                    self.stdout.write(f'Skipping {entry.name}: not a recognised image')
+                    skipped += 1
+                    continue
+
+                old_url = f'{settings.MEDIA_URL}{entry.name}'
+                if options['dry_run']:
+                    self.stdout.write(f'Would move {entry.name}')
+                    moved += 1
+                    continue
+
+                sha256, size = blobstore.hash_file(entry.path)
+
+                # The store consumes a hard link, so the flat file stays in
+                # place until its receipts have been repointed; a run that
+                # stops part way can simply be started again
+                staged = os.path.join(incoming_dir(), entry.name)
+                if os.path.exists(staged):
+                    os.remove(staged)
+                os.link(entry.path, staged)
+                blob = blobstore.store(staged, sha256, extension, size)
+
+                with transaction.atomic():
+                    count = Receipt.objects.filter(image_url=old_url).update(
+                        image_url=blob.url, image_blob=blob
+                    )
+                    blobstore.acquire(blob, count)
+                os.remove(entry.path)
+                moved += 1
+
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved} files, skipped {skipped}'))
@@ -0,0 +1,33 @@
+"""
+Rebuild or verify the daily spending rollup
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.receipts import rollups
+from apps.users.budget_state import reset_period_states
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily_spending rollup from receipts, or verify it with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report mismatches')
+        parser.add_argument('--user', type=int, help='Limit to one user id')
+
+    def handle(self, *args, **options):
+        user_id = options['user']
+
+        if options['verify']:
+            mismatches = 0
+            for key, expected, actual in rollups.verify(user_id):
+                mismatches += 1
+                self.stdout.write(f'{key}: expected {expected}, found {actual}')
+            if mismatches:
+                raise CommandError(f'{mismatches} rollup rows out of date')
+            self.stdout.write(self.style.SUCCESS('Rollup matches receipts'))
+            return
+
+        count = rollups.rebuild(user_id)
+        # Budget period state is derived from the rollup
+        reset_period_states(user_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollup rows'))
@@ -0,0 +1,75 @@
+"""
+Receipt export worker
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.receipts.export_jobs import claim_jobs, cleanup_expired, run_job
+
+
+# Seconds between sweeps for expired artifacts
+CLEANUP_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Render queued receipt export jobs and delete expired artifacts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.EXPORT_WORKER_CONCURRENCY)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Drain queued jobs and exit')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.cleanup_lock = threading.Lock()
+        self.last_cleanup = 0
+        threads = [
+            threading.Thread(target=self.work, args=(options,), name=f'export-worker-{i}', daemon=True)
+            for i in range(max(1, options['concurrency']))
+        ]
+        self.stdout.write(f'Export worker started with {len(threads)} thread(s)')
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write('Export worker stopped')
+
+    def cleanup(self):
+        with self.cleanup_lock:
+            if time.monotonic() - self.last_cleanup < CLEANUP_INTERVAL:
+                return
+            self.last_cleanup = time.monotonic()
+        removed = cleanup_expired()
+        if removed:
+            self.stdout.write(f'Deleted {removed} expired export(s)')
+
+    def work(self, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                # One job per claim: renders are long, so leave the rest to idle threads
+                jobs = claim_jobs(1)
+                for job_id in jobs:
+                    try:
+                        run_job(job_id)
+                    except Exception as e:
+                        self.stderr.write(f'Export job {job_id} failed: {e}')
+                        continue
+                    self.stdout.write(f'Export job {job_id} done')
+                if not jobs:
+                    self.cleanup()
+                    if options['once']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+        finally:
+            connection.close()
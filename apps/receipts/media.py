@@ -0,0 +1,152 @@
+"""
+Receipt image delivery
+
+Views decide whether a file may be served; the bytes are then handed to
+the front proxy with X-Accel-Redirect (nginx) or X-Sendfile (Apache,
+lighttpd) when MEDIA_SENDFILE_BACKEND is set, or streamed from Python with
+single-range support otherwise. Stored files are content-addressed, so
+their hash is a strong ETag.
+
+Signed URLs let clients fetch images without an Authorization header
+(e.g. from <img> tags): /api/media/<path>?exp=<unix time>&sig=<hmac>,
+verified from the URL alone without touching the database.
+"""
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import time
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+SIGNED_PATH_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_\w+)?\.\w+$')
+
+
+def _signing_key():
+    return (settings.MEDIA_SIGNING_KEY or settings.SECRET_KEY).encode()
+
+
+def sign_path(path, expires):
+    """HMAC-SHA256 signature of a media path and its expiry time"""
+    message = f"{path}:{expires}".encode()
+    return hmac.new(_signing_key(), message, hashlib.sha256).hexdigest()
+
+
+def signed_url(path, ttl=None):
+    """A short-lived URL for a media path; returns (url, expires)"""
+    expires = int(time.time()) + (ttl or settings.MEDIA_SIGNED_URL_TTL)
+    return f"/api/media/{path}?exp={expires}&sig={sign_path(path, expires)}", expires
+
+
+def verify_signature(path, expires, signature):
+    """Whether a signed URL is genuine and unexpired"""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_path(path, expires), signature or '')
+
+
+def _iter_range(f, start, length):
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(settings.UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def _python_response(request, full_path, etag, content_type):
+    """Serve a file from Python, honouring a single byte range"""
+    size = os.path.getsize(full_path)
+    header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    match = RANGE_RE.match(header.strip())
+
+    # Multiple ranges, malformed ranges or a stale If-Range get the whole file
+    if not match or (if_range and if_range != etag) or match.group(1) == match.group(2) == '':
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _iter_range(open(full_path, 'rb'), start, length),
+        status=206,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_media(request, path, etag, cache_control=IMMUTABLE_CACHE_CONTROL):
+    """Response delivering MEDIA_ROOT/path, via the proxy when one is configured"""
+    if request.META.get('HTTP_IF_NONE_MATCH') and etag in parse_etags(request.META['HTTP_IF_NONE_MATCH']):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    full_path = os.path.join(settings.MEDIA_ROOT, path)
+    if not os.path.isfile(full_path):
+        return HttpResponse(status=404)
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    backend = settings.MEDIA_SENDFILE_BACKEND
+
+    if backend == 'nginx':
+        # nginx serves the internal location itself, including Range requests
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{settings.MEDIA_ACCEL_PREFIX}{path}"
+    elif backend == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.abspath(full_path)
+    else:
+        response = _python_response(request, full_path, etag, content_type)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def signed_media(request, path):
+    """Serve a signed media URL; checks only the signature, never the database"""
+    if request.method not in ('GET', 'HEAD') or not SIGNED_PATH_RE.match(path):
+        return HttpResponse(status=404)
+    if not verify_signature(path, request.GET.get('exp'), request.GET.get('sig')):
+        return HttpResponse(status=403)
+
+    # Content-addressed paths never change, so the file name is its ETag
+    etag = '"' + os.path.splitext(os.path.basename(path))[0] + '"'
+    return serve_media(request, path, etag)
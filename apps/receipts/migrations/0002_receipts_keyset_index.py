@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='receipt',
+            options={'ordering': ['-date', '-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['user', '-date', '-created_at', '-id'], name='receipts_user_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_daily_spending(apps, schema_editor):
+    Receipt = apps.get_model('receipts', 'Receipt')
+    DailySpending = apps.get_model('receipts', 'DailySpending')
+    rows = Receipt.objects.order_by().values('user_id', 'date', 'category').annotate(
+        total=Sum('amount'),
+        count=Count('id'),
+    )
+    DailySpending.objects.bulk_create(
+        (DailySpending(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0002_receipts_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(max_length=100)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spending', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'daily_spending',
+                'constraints': [models.UniqueConstraint(fields=('user', 'date', 'category'), name='daily_spending_user_date_category_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_spending, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,71 @@ from django.db import models
 from django.conf import settings
 
 
+class ImageBlob(models.Model):
+    """A stored image file, keyed by the SHA-256 of its content and shared by receipts"""
+    
+    DERIVATIVES_PENDING = 'pending'
+    DERIVATIVES_READY = 'ready'
+    DERIVATIVES_FAILED = 'failed'
+    DERIVATIVES_STATUS_CHOICES = [
+        (DERIVATIVES_PENDING, 'Pending'),
+        (DERIVATIVES_READY, 'Ready'),
+        (DERIVATIVES_FAILED, 'Failed'),
+    ]
+    
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    extension = models.CharField(max_length=10)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    # Downscaled copies for lists and detail views, relative to MEDIA_ROOT
+    derivatives_status = models.CharField(
+        max_length=10,
+        choices=DERIVATIVES_STATUS_CHOICES,
+        default=DERIVATIVES_PENDING
+    )
+    thumbnail = models.CharField(max_length=200, blank=True, null=True)
+    preview = models.CharField(max_length=200, blank=True, null=True)
+    # Tiny blurred data: URI shown while the thumbnail loads
+    placeholder = models.TextField(blank=True, null=True)
+    # Last time a reference was added or dropped; GC leaves recently touched blobs alone
+    touched_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'image_blobs'
+        indexes = [
+            models.Index(
+                fields=['touched_at'],
+                name='image_blobs_orphan_idx',
+                condition=models.Q(ref_count__lte=0),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.sha256}.{self.extension} ({self.ref_count} refs)"
+    
+    @property
+    def path(self):
+        """Location relative to MEDIA_ROOT, sharded by the first two hash bytes"""
+        return f"{self.sha256[:2]}/{self.sha256[2:4]}/{self.sha256}.{self.extension}"
+    
+    @property
+    def url(self):
+        return f"{settings.MEDIA_URL}{self.path}"
+    
+    def derivative_path(self, kind):
+        """Location of a derivative file, next to the original"""
+        return f"{self.sha256[:2]}/{self.sha256[2:4]}/{self.sha256}_{kind}.webp"
+    
+    @property
+    def thumbnail_url(self):
+        return f"{settings.MEDIA_URL}{self.thumbnail}" if self.thumbnail else None
+    
+    @property
+    def preview_url(self):
+        return f"{settings.MEDIA_URL}{self.preview}" if self.preview else None
+
+
 class Receipt(models.Model):
     """Receipt model for tracking expenses"""
     
@@ -18,19 +83,34 @@ class Receipt(models.Model):
     category = models.CharField(max_length=100)
     date = models.DateField()
     image_url = models.CharField(max_length=500, blank=True, null=True)
+    image_blob = models.ForeignKey(
+        ImageBlob,
+        on_delete=models.PROTECT,
+        related_name='receipts',
+        blank=True,
+        null=True
+    )
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'receipts'
-        ordering = ['-date', '-created_at']
+        ordering = ['-date', '-created_at', '-id']
+        indexes = [
+            # Serves keyset pagination: WHERE user_id = ? ORDER BY date, created_at, id DESC
+            models.Index(
+                fields=['user', '-date', '-created_at', '-id'],
+                name='receipts_user_keyset_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} - ${self.amount}"
     
     def to_dict(self):
         """Convert receipt to dictionary for API response"""
+        blob = self.image_blob
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -39,7 +119,114 @@ class Receipt(models.Model):
             'category': self.category,
             'date': self.date.isoformat() if self.date else None,
             'image_url': self.image_url,
+            'thumbnail_url': blob.thumbnail_url if blob else None,
+            'preview_url': blob.preview_url if blob else None,
+            'image_placeholder': blob.placeholder if blob else None,
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+class DailySpending(models.Model):
+    """Per-user daily spending rollup by category, kept in step with receipt writes"""
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_spending'
+    )
+    date = models.DateField()
+    category = models.CharField(max_length=100)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'daily_spending'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'category'],
+                name='daily_spending_user_date_category_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.date} {self.category}: ${self.total} ({self.count})"
+
+
+class ExportJob(models.Model):
+    """A receipt export rendered in the background by run_export_worker"""
+    
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='export_jobs'
+    )
+    format = models.CharField(max_length=10)
+    filters = models.JSONField(default=dict)
+    # Hash of (format, filters, data version); equal jobs share one artifact
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    rows_total = models.IntegerField(null=True, blank=True)
+    rows_done = models.IntegerField(default=0)
+    file_path = models.CharField(max_length=255, blank=True, default='')
+    filename = models.CharField(max_length=255, blank=True, default='')
+    size = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'export_jobs'
+        ordering = ['-created_at']
+        constraints = [
+            # At most one live job per identical request; failed ones can be retried
+            models.UniqueConstraint(
+                fields=['user', 'fingerprint'],
+                condition=~models.Q(status='failed'),
+                name='export_jobs_user_fingerprint_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='export_jobs_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Export {self.id} ({self.format}, {self.status})"
+    
+    def to_dict(self):
+        """Convert export job to dictionary for API response"""
+        progress = None
+        if self.rows_total:
+            progress = min(self.rows_done / self.rows_total, 1.0)
+        elif self.status == self.STATUS_DONE:
+            progress = 1.0
+        return {
+            'id': self.id,
+            'format': self.format,
+            'filters': self.filters,
+            'status': self.status,
+            'rows_total': self.rows_total,
+            'rows_done': self.rows_done,
+            'progress': progress,
+            'size': self.size,
+            'error': self.error or None,
+            'download_url': f"/api/receipts/exports/{self.id}/download/" if self.status == self.STATUS_DONE else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
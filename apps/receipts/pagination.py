@@ -0,0 +1,120 @@
+"""
+Keyset (cursor) pagination for receipts
+"""
+import base64
+import json
+from datetime import date, datetime
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import Q
+
+
+# Receipts are always paged in this order; the composite index on
+# receipts(user_id, date DESC, created_at DESC, id DESC) serves it directly.
+KEYSET_ORDERING = ('-date', '-created_at', '-id')
+REVERSE_ORDERING = ('date', 'created_at', 'id')
+
+NEXT = 'n'
+PREV = 'p'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(receipt_date, created_at, receipt_id, direction=NEXT):
+    """Encode a receipt sort key as an opaque cursor string"""
+    payload = [direction, receipt_date.isoformat(), created_at.isoformat(), receipt_id]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (direction, date, created_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, receipt_date, created_at, receipt_id = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        if direction not in (NEXT, PREV):
+            raise ValueError(direction)
+        return (
+            direction,
+            date.fromisoformat(receipt_date),
+            datetime.fromisoformat(created_at),
+            int(receipt_id),
+        )
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def _after(receipt_date, created_at, receipt_id):
+    """Rows that sort after the key in (-date, -created_at, -id) order"""
+    # The leading date__lte bound keeps the index scan range-limited
+    return Q(date__lte=receipt_date) & (
+        Q(date__lt=receipt_date)
+        | Q(date=receipt_date, created_at__lt=created_at)
+        | Q(date=receipt_date, created_at=created_at, id__lt=receipt_id)
+    )
+
+
+def _before(receipt_date, created_at, receipt_id):
+    """Rows that sort before the key in (-date, -created_at, -id) order"""
+    return Q(date__gte=receipt_date) & (
+        Q(date__gt=receipt_date)
+        | Q(date=receipt_date, created_at__gt=created_at)
+        | Q(date=receipt_date, created_at=created_at, id__gt=receipt_id)
+    )
+
+
+def parse_page_size(limit):
+    """Clamp the requested page size to the configured bounds"""
+    if not limit:
+        return settings.RECEIPTS_PAGE_SIZE
+    try:
+        size = int(limit)
+    except ValueError:
+        return settings.RECEIPTS_PAGE_SIZE
+    return max(1, min(size, settings.RECEIPTS_MAX_PAGE_SIZE))
+
+
+def paginate_receipts(queryset, cursor=None, limit=None, key=attrgetter('date', 'created_at', 'id')):
+    """
+    Fetch one page of receipts using keyset pagination.
+
+    Returns (rows, next_cursor, prev_cursor). Each page is a single index
+    range scan of at most limit + 1 rows, so latency does not depend on how
+    deep the page is. key extracts (date, created_at, id) from a row, which
+    lets the queryset yield either model instances or values_list tuples.
+    """
+    page_size = parse_page_size(limit)
+    direction = NEXT
+
+    if cursor:
+        direction, receipt_date, created_at, receipt_id = decode_cursor(cursor)
+        if direction == NEXT:
+            queryset = queryset.filter(_after(receipt_date, created_at, receipt_id))
+        else:
+            queryset = queryset.filter(_before(receipt_date, created_at, receipt_id))
+
+    ordering = KEYSET_ORDERING if direction == NEXT else REVERSE_ORDERING
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if direction == PREV:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, bool(cursor)
+
+    next_cursor = None
+    prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor(*key(rows[-1]), NEXT)
+        if has_prev:
+            prev_cursor = encode_cursor(*key(rows[0]), PREV)
+
+    return rows, next_cursor, prev_cursor
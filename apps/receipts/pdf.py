@@ -0,0 +1,175 @@
+"""
+Page-streaming PDF receipt export
+
+Rows are drawn straight onto the canvas one page at a time from a single
+iterator, instead of being collected into one platypus Table that
+reportlab has to measure and split as a whole. Nothing but the current
+page's drawing state depends on earlier rows, so render time is linear in
+the row count, and memory grows only with the page streams reportlab
+keeps until it compresses them (pageCompression) on save. The count and
+total come from the same pass, and layout metrics and colours are
+computed once per process.
+"""
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+
+TITLE = 'Fint - Receipt Export'
+HEADERS = ('Date', 'Name', 'Category', 'Amount', 'Notes')
+
+
+@lru_cache(maxsize=None)
+def page_style():
+    """Layout shared by every export in this process"""
+    page_width, page_height = A4
+    column_widths = (1.2 * inch, 1.8 * inch, 1.3 * inch, 1 * inch, 1.5 * inch)
+    table_width = sum(column_widths)
+    left = (page_width - table_width) / 2
+
+    edges = [left]
+    for width in column_widths:
+        edges.append(edges[-1] + width)
+
+    return {
+        'page_size': A4,
+        'top': page_height - 0.5 * inch,
+        'bottom': 0.5 * inch,
+        'left': left,
+        'right': left + table_width,
+        'edges': tuple(edges),
+        'centres': tuple((edges[i] + edges[i + 1]) / 2 for i in range(len(column_widths))),
+        'header_height': 31,
+        'row_height': 25,
+        'accent': colors.HexColor('#10b981'),
+        'grid': colors.HexColor('#e5e7eb'),
+        'total_fill': colors.HexColor('#f0fdf4'),
+        'header_text': colors.whitesmoke,
+        'text': colors.black,
+    }
+
+
+def _format_row(receipt_date, name, category, amount, notes):
+    return (
+        receipt_date.strftime('%Y-%m-%d') if receipt_date else '',
+        name[:30] + '...' if len(name) > 30 else name,
+        category,
+        f"${float(amount):.2f}",
+        (notes or '')[:20] + '...' if notes and len(notes) > 20 else (notes or ''),
+    )
+
+
+class _PageWriter:
+    """Draws table rows onto a canvas, starting new pages as they fill"""
+
+    def __init__(self, canvas, style):
+        self.canvas = canvas
+        self.style = style
+        self.y = style['top']
+        self.page_top = None
+
+    def _grid(self):
+        """Close the current page's table with vertical rules"""
+        if self.page_top is None:
+            return
+        c, s = self.canvas, self.style
+        c.setStrokeColor(s['grid'])
+        c.setLineWidth(1)
+        for x in s['edges']:
+            c.line(x, self.page_top, x, self.y)
+
+    def text(self, text, font, size, color, space_after):
+        c = self.canvas
+        self.y -= size * 1.2
+        c.setFont(font, size)
+        c.setFillColor(color)
+        c.drawString(self.style['left'], self.y, text)
+        self.y -= space_after
+
+    def header(self):
+        c, s = self.canvas, self.style
+        height = s['header_height']
+        self.page_top = self.y
+        c.setFillColor(s['accent'])
+        c.setStrokeColor(s['grid'])
+        c.rect(s['left'], self.y - height, s['right'] - s['left'], height, stroke=1, fill=1)
+        c.setFont('Helvetica-Bold', 11)
+        c.setFillColor(s['header_text'])
+        baseline = self.y - height + 12 + 2
+        for centre, label in zip(s['centres'], HEADERS):
+            c.drawCentredString(centre, baseline, label)
+        self.y -= height
+
+    def ensure_room(self, height):
+        if self.y - height >= self.style['bottom']:
+            return
+        self._grid()
+        self.canvas.showPage()
+        self.y = self.style['top']
+        self.header()
+
+    def row(self, cells, bold=False, fill=None):
+        c, s = self.canvas, self.style
+        height = s['row_height']
+        self.ensure_room(height)
+        if fill is not None:
+            c.setFillColor(fill)
+            c.rect(s['left'], self.y - height, s['right'] - s['left'], height, stroke=0, fill=1)
+
+        # One text object per row keeps the page's content stream small
+        font = 'Helvetica-Bold' if bold else 'Helvetica'
+        text = c.beginText()
+        text.setFont(font, 9)
+        text.setFillColor(s['text'])
+        baseline = self.y - height / 2 - 3
+        for centre, value in zip(s['centres'], cells):
+            if value:
+                text.setTextOrigin(centre - stringWidth(value, font, 9) / 2, baseline)
+                text.textOut(value)
+        c.drawText(text)
+
+        self.y -= height
+        c.setStrokeColor(s['grid'])
+        c.line(s['left'], self.y, s['right'], self.y)
+
+    def finish_table(self):
+        self._grid()
+        self.page_top = None
+
+
+def write_pdf(output, rows, start_date=None, end_date=None):
+    """Render (date, name, category, amount, notes) rows as a PDF into output; returns (count, total)"""
+    style = page_style()
+    canvas = Canvas(output, pagesize=style['page_size'], pageCompression=1)
+    canvas.setTitle(TITLE)
+    writer = _PageWriter(canvas, style)
+
+    writer.text(TITLE, 'Helvetica-Bold', 18, style['accent'], 12)
+    if start_date or end_date:
+        writer.text(f"Period: {start_date or 'Beginning'} to {end_date or 'Present'}", 'Helvetica', 10, style['text'], 0)
+    writer.text(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", 'Helvetica', 10, style['text'], 20)
+    writer.header()
+
+    count = 0
+    total = Decimal('0.00')
+    for receipt_date, name, category, amount, notes in rows:
+        writer.row(_format_row(receipt_date, name, category, amount, notes))
+        count += 1
+        total += amount
+
+    writer.row(('', '', '', f"${float(total):.2f}", 'TOTAL'), bold=True, fill=style['total_fill'])
+    writer.finish_table()
+
+    writer.ensure_room(40)
+    writer.y -= 20
+    writer.text(f"Total Receipts: {count} | Total Amount: ${float(total):.2f}", 'Helvetica', 10, style['text'], 0)
+
+    canvas.showPage()
+    canvas.save()
+    return count, total
@@ -0,0 +1,107 @@
+"""
+Lightweight receipt read model
+
+Read paths fetch plain tuples with values_list() and turn them into API
+dicts with one shared serializer, instead of instantiating Receipt models
+and calling to_dict(). Only the requested columns are selected and
+converted.
+"""
+from operator import itemgetter
+
+from django.conf import settings
+
+
+class InvalidFields(ValueError):
+    """Raised when ?fields= names a field the API does not expose"""
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _media_url(path):
+    return f"{settings.MEDIA_URL}{path}" if path else None
+
+
+# API field name -> (database column, converter or None)
+RECEIPT_FIELDS = {
+    'id': ('id', None),
+    'user_id': ('user_id', None),
+    'name': ('name', None),
+    'amount': ('amount', float),
+    'category': ('category', None),
+    'date': ('date', _isoformat),
+    'image_url': ('image_url', None),
+    'thumbnail_url': ('image_blob__thumbnail', _media_url),
+    'preview_url': ('image_blob__preview', _media_url),
+    'image_placeholder': ('image_blob__placeholder', None),
+    'notes': ('notes', None),
+    'created_at': ('created_at', _isoformat),
+    'updated_at': ('updated_at', _isoformat),
+}
+
+DEFAULT_FIELDS = tuple(RECEIPT_FIELDS)
+
+# Columns keyset pagination needs to build cursors
+KEYSET_COLUMNS = ('date', 'created_at', 'id')
+
+
+class ReceiptProjection:
+    """A fixed set of receipt fields and the columns needed to produce them"""
+
+    __slots__ = ('fields', 'columns', '_plan', '_key')
+
+    def __init__(self, fields=DEFAULT_FIELDS, extra_columns=()):
+        columns = []
+        for name in fields:
+            column = RECEIPT_FIELDS[name][0]
+            if column not in columns:
+                columns.append(column)
+        for column in extra_columns:
+            if column not in columns:
+                columns.append(column)
+
+        self.fields = tuple(fields)
+        self.columns = tuple(columns)
+        self._plan = tuple(
+            (name, columns.index(RECEIPT_FIELDS[name][0]), RECEIPT_FIELDS[name][1])
+            for name in self.fields
+        )
+        self._key = None
+        if all(c in columns for c in KEYSET_COLUMNS):
+            self._key = itemgetter(*(columns.index(c) for c in KEYSET_COLUMNS))
+
+    @classmethod
+    def from_param(cls, param, extra_columns=()):
+        """Build a projection from a comma-separated ?fields= value"""
+        if not param:
+            return cls(extra_columns=extra_columns)
+        fields = []
+        for name in param.split(','):
+            name = name.strip()
+            if not name:
+                continue
+            if name not in RECEIPT_FIELDS:
+                raise InvalidFields(f'Unknown field: {name}')
+            if name not in fields:
+                fields.append(name)
+        return cls(fields or DEFAULT_FIELDS, extra_columns)
+
+    def rows(self, queryset):
+        """Narrow a receipt queryset to this projection's columns"""
+        return queryset.values_list(*self.columns)
+
+    def column(self, name):
+        """Index of a database column within each row"""
+        return self.columns.index(name)
+
+    def keyset_key(self, row):
+        """(date, created_at, id) of a row, for pagination cursors"""
+        return self._key(row)
+
+    def to_dict(self, row):
+        """Serialize one row tuple into an API dict"""
+        return {
+            name: convert(row[index]) if convert else row[index]
+            for name, index, convert in self._plan
+        }
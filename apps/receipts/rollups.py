@@ -0,0 +1,111 @@
+"""
+Daily spending rollup maintenance
+
+Every receipt write applies a signed (total, count) delta to its
+(user, date, category) row with a single upsert, so stats and budget reads
+aggregate over at most one row per day and category instead of over the
+user's whole receipt history.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from .models import DailySpending, Receipt
+
+
+def _table():
+    return connection.ops.quote_name(DailySpending._meta.db_table)
+
+
+def apply_delta(user_id, date, category, amount, count):
+    """Add amount and count to one rollup row, creating it if needed"""
+    table = _table()
+    q = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, {q('date')}, category, total, {q('count')}) "
+            f"VALUES (%s, %s, %s, %s, %s) "
+            f"ON CONFLICT (user_id, {q('date')}, category) DO UPDATE SET "
+            f"total = {table}.total + EXCLUDED.total, "
+            f"{q('count')} = {table}.{q('count')} + EXCLUDED.{q('count')}",
+            [user_id, date, category, amount, count],
+        )
+        if count < 0:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE user_id = %s AND {q('date')} = %s "
+                f"AND category = %s AND {q('count')} <= 0",
+                [user_id, date, category],
+            )
+
+
+def add_receipt(receipt):
+    """Count a newly created or updated receipt in the rollup"""
+    apply_delta(receipt.user_id, receipt.date, receipt.category, receipt.amount, 1)
+
+
+def remove_receipt(receipt):
+    """Remove a receipt's previous values from the rollup"""
+    apply_delta(receipt.user_id, receipt.date, receipt.category, -receipt.amount, -1)
+
+
+def move_category(user_id, old_category, new_category):
+    """Fold all of a user's rollup rows for one category into another"""
+    if old_category == new_category:
+        return
+    table = _table()
+    q = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, {q('date')}, category, total, {q('count')}) "
+            f"SELECT user_id, {q('date')}, %s, total, {q('count')} FROM {table} "
+            f"WHERE user_id = %s AND category = %s "
+            f"ON CONFLICT (user_id, {q('date')}, category) DO UPDATE SET "
+            f"total = {table}.total + EXCLUDED.total, "
+            f"{q('count')} = {table}.{q('count')} + EXCLUDED.{q('count')}",
+            [new_category, user_id, old_category],
+        )
+        cursor.execute(
+            f"DELETE FROM {table} WHERE user_id = %s AND category = %s",
+            [user_id, old_category],
+        )
+
+
+def aggregate_receipts(user_id=None):
+    """Rollup rows computed from scratch out of the receipts table"""
+    queryset = Receipt.objects.all()
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    return queryset.order_by().values('user_id', 'date', 'category').annotate(
+        total=Sum('amount'),
+        count=Count('id'),
+    )
+
+
+def rebuild(user_id=None, batch_size=1000):
+    """Replace rollup rows with freshly aggregated ones; returns the row count"""
+    with transaction.atomic():
+        existing = DailySpending.objects.all()
+        if user_id is not None:
+            existing = existing.filter(user_id=user_id)
+        existing.delete()
+
+        rows = [DailySpending(**row) for row in aggregate_receipts(user_id).iterator()]
+        DailySpending.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def verify(user_id=None):
+    """Yield (key, expected, actual) for every rollup row that disagrees with receipts"""
+    expected = {
+        (r['user_id'], r['date'], r['category']): (r['total'], r['count'])
+        for r in aggregate_receipts(user_id).iterator()
+    }
+    actual_rows = DailySpending.objects.all()
+    if user_id is not None:
+        actual_rows = actual_rows.filter(user_id=user_id)
+    actual = {
+        (r[0], r[1], r[2]): (r[3], r[4])
+        for r in actual_rows.values_list('user_id', 'date', 'category', 'total', 'count').iterator()
+    }
+    for key in sorted(expected.keys() | actual.keys(), key=str):
+        if expected.get(key) != actual.get(key):
+            yield key, expected.get(key), actual.get(key)
@@ -2,43 +2,41 @@
 Statistics views
 """
 from datetime import datetime
-from django.db.models import Sum, Count
+from django.db.models import Q, Sum
 from django.db.models.functions import TruncMonth
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from .models import Receipt
+from apps.users.versioning import etag_on_data_version
+from .models import DailySpending
 
 
 @api_view(['GET'])
+@etag_on_data_version
 def get_stats_summary(request):
     """Get spending summary statistics"""
     user = request.user
     
-    # Total spent
-    total_spent = Receipt.objects.filter(user=user).aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    # This month spent
     current_month = datetime.now().replace(day=1).date()
-    monthly_spent = Receipt.objects.filter(
-        user=user,
-        date__gte=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Total receipts count
-    total_receipts = Receipt.objects.filter(user=user).count()
     
-    # Spending by category
-    categories = Receipt.objects.filter(user=user).values('category').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
+    # One grouped query: per-category totals plus this month's share via
+    # SUM(...) FILTER (WHERE date >= month start); overall figures are the
+    # sums of the category rows.
+    categories = DailySpending.objects.filter(user=user).values('category').annotate(
+        spent=Sum('total'),
+        month_spent=Sum('total', filter=Q(date__gte=current_month)),
+        receipts=Sum('count'),
+    ).order_by('-spent')
     
-    categories_list = [
-        {'category': c['category'], 'total': float(c['total'])}
-        for c in categories
-    ]
+    total_spent = 0
+    monthly_spent = 0
+    total_receipts = 0
+    categories_list = []
+    for c in categories:
+        total_spent += c['spent']
+        monthly_spent += c['month_spent'] or 0
+        total_receipts += c['receipts']
+        categories_list.append({'category': c['category'], 'total': float(c['spent'])})
     
     return Response({
         'total_spent': float(total_spent),
@@ -50,14 +48,15 @@ def get_stats_summary(request):
 
 
 @api_view(['GET'])
+@etag_on_data_version
 def get_monthly_stats(request):
     """Get monthly spending breakdown"""
     user = request.user
     
-    monthly_data = Receipt.objects.filter(user=user).annotate(
+    monthly_data = DailySpending.objects.filter(user=user).annotate(
         month=TruncMonth('date')
     ).values('month').annotate(
-        total=Sum('amount')
+        total=Sum('total')
     ).order_by('-month')[:12]
     
     result = [
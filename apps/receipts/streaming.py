@@ -0,0 +1,105 @@
+"""
+Incremental JSON and CSV encoding for large receipt responses
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+
+def iter_json_array(rows, serialize, chunk_size=None):
+    """
+    Yield a JSON array piece by piece.
+
+    Rows are encoded and flushed in batches of chunk_size so memory stays
+    bounded by one batch no matter how many rows the iterable produces.
+    """
+    chunk_size = chunk_size or settings.RECEIPTS_STREAM_CHUNK_SIZE
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    yield '['
+    batch = []
+    first = True
+    for row in rows:
+        batch.append(encode(serialize(row)))
+        if len(batch) >= chunk_size:
+            yield ('' if first else ',') + ','.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ',') + ','.join(batch)
+    yield ']'
+
+
+def iter_json_object(head, array_key, rows, serialize, chunk_size=None):
+    """Yield a JSON object made of the small head dict plus one streamed array"""
+    prefix = json.dumps(head)[:-1]
+    yield prefix + (', ' if head else '') + json.dumps(array_key) + ': '
+    yield from iter_json_array(rows, serialize, chunk_size)
+    yield '}'
+
+
+def streaming_json_response(head, array_key, queryset, serialize):
+    """Stream a queryset as {**head, array_key: [...]} using a DB-side cursor"""
+    chunk_size = settings.RECEIPTS_STREAM_CHUNK_SIZE
+    rows = queryset.iterator(chunk_size=chunk_size)
+    return StreamingHttpResponse(
+        iter_json_object(head, array_key, rows, serialize, chunk_size),
+        content_type='application/json',
+    )
+
+
+class Echo:
+    """Pseudo-file whose write() hands each formatted CSV line back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, chunk_size=None):
+    """Yield CSV text for an iterable of row lists, flushed in batches of chunk_size rows"""
+    chunk_size = chunk_size or settings.RECEIPTS_STREAM_CHUNK_SIZE
+    writerow = csv.writer(Echo()).writerow
+
+    batch = []
+    for row in rows:
+        batch.append(writerow(row))
+        if len(batch) >= chunk_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+class StreamBuffer:
+    """Write-only, unseekable file whose contents are taken out with drain()"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        # Writers close their sink when they finish; the contents stay drainable
+        self.closed = True
+
+    def drain(self):
+        """Yield whatever has been written since the last drain, if anything"""
+        if self._chunks:
+            data = b''.join(self._chunks)
+            self._chunks = []
+            yield data
@@ -0,0 +1,107 @@
+"""
+Tests for the receipts app
+"""
+from datetime import date
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+
+from .export_jobs import claim_jobs, run_job
+from .models import ExportJob, ImageBlob, Receipt
+
+
+class StatsSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='stats@example.com', name='Stats', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_receipt(self, amount, category, receipt_date):
+        response = self.client.post(
+            '/api/receipts/',
+            {'name': 'Receipt', 'amount': amount, 'category': category, 'date': receipt_date.isoformat()},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_summary_is_one_aggregate_query(self):
+        this_month = date.today().replace(day=1)
+        last_year = this_month.replace(year=this_month.year - 1)
+        self.add_receipt('12.50', 'Food', this_month)
+        self.add_receipt('7.50', 'Food', last_year)
+        self.add_receipt('30.00', 'Rent', last_year)
+
+        # The data version lookup behind the ETag, then the summary itself
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/stats/summary')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_spent'], 50.0)
+        self.assertEqual(response.data['monthly_spent'], 12.5)
+        self.assertEqual(response.data['total_receipts'], 3)
+        self.assertEqual(response.data['top_category'], 'Rent')
+        self.assertEqual(
+            response.data['categories'],
+            [{'category': 'Rent', 'total': 30.0}, {'category': 'Food', 'total': 20.0}],
+        )
+
+
+class ReceiptImageUrlTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', name='Owner', password=None)
+        self.other = User.objects.create_user(email='other@example.com', name='Other', password=None)
+        self.blob = ImageBlob.objects.create(sha256='ab' * 32, extension='png', size=10, ref_count=1)
+        Receipt.objects.create(
+            user=self.owner, name='Owned', amount='1.00', category='Food', date=date.today(),
+            image_url=self.blob.url, image_blob=self.blob,
+        )
+        self.receipt = Receipt.objects.create(
+            user=self.other, name='Other', amount='2.00', category='Food', date=date.today(),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.other)
+
+    def test_image_url_does_not_attach_another_users_image(self):
+        response = self.client.put(f'/api/receipts/{self.receipt.id}/', {'imageUrl': self.blob.url}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.receipt.refresh_from_db()
+        self.assertIsNone(self.receipt.image_blob_id)
+        self.assertEqual(self.client.get(f'/api/receipts/{self.receipt.id}/image/').status_code, 404)
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 1)
+
+
+@override_settings(EXPORT_JOB_MAX_ATTEMPTS=2)
+class ExportJobFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='export@example.com', name='Export', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_invalid_filters_are_rejected_before_queueing(self):
+        for filters in ({'fields': ['name']}, {'start_date': 'garbage'}, {'end_date': 20260101}):
+            response = self.client.post('/api/receipts/exports/', dict(filters, format='csv'), format='json')
+            self.assertEqual(response.status_code, 400, filters)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_setup_failure_fails_the_job(self):
+        # Queued before filters were validated
+        job = ExportJob.objects.create(
+            user=self.user, format='csv', filters={'start_date': 'garbage'},
+            fingerprint='legacy', expires_at=timezone.now(),
+        )
+        for _ in range(2):
+            ExportJob.objects.filter(id=job.id).update(locked_until=None)
+            for job_id in claim_jobs(1):
+                with self.assertRaises(Exception):
+                    run_job(job_id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('ValidationError', job.error)
+        self.assertEqual(claim_jobs(1), [])
@@ -0,0 +1,222 @@
+"""
+Streaming receipt image uploads
+
+Image bytes are written to disk chunk by chunk as they arrive, whether
+they come from a multipart form, a raw request body or the legacy base64
+imageData field. The type is sniffed from the first bytes and the size
+is checked on every chunk, so bad uploads are rejected early and memory
+per upload stays at about one chunk.
+"""
+import binascii
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+
+from .blobstore import hash_file, store
+from .ingest import normalize_upload
+
+
+# Leading bytes that identify each accepted image format
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+SNIFF_BYTES = 12
+
+# Under MEDIA_ROOT; files left here by interrupted requests are swept by gc_image_blobs
+INCOMING_DIR = '.incoming'
+
+
+class UploadRejected(Exception):
+    """Raised when an upload is too large or not an accepted image"""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_image_type(head):
+    """Extension for the image format the leading bytes belong to, or None"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def _too_large():
+    limit_mb = settings.MAX_UPLOAD_SIZE // (1024 * 1024)
+    return UploadRejected(
+        f'Image exceeds the {limit_mb}MB upload limit',
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    )
+
+
+def incoming_dir():
+    """Staging directory for uploads in progress, on the same filesystem as MEDIA_ROOT"""
+    path = os.path.join(settings.MEDIA_ROOT, INCOMING_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class ImageSink:
+    """Writes an image to a staging file, validating size and type as bytes arrive"""
+
+    def __init__(self):
+        self._file = tempfile.NamedTemporaryFile(dir=incoming_dir(), delete=False)
+        self.path = self._file.name
+        self.size = 0
+        self.extension = None
+        self._head = b''
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > settings.MAX_UPLOAD_SIZE:
+            raise _too_large()
+
+        if self.extension is None:
+            self._head += data[:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type()
+        self._file.write(data)
+        self._digest.update(data)
+
+    def _check_type(self):
+        self.extension = sniff_image_type(self._head)
+        if self.extension not in settings.ALLOWED_IMAGE_EXTENSIONS:
+            raise UploadRejected('Unsupported image type')
+
+    def close(self):
+        """Finish writing; returns self for chaining"""
+        if self.extension is None:
+            if not self.size:
+                self.abort()
+                raise UploadRejected('Image is empty')
+            self._check_type()
+        self._file.close()
+        return self
+
+    def save(self):
+        """Normalize the finished image, move it into the blob store and return its ImageBlob"""
+        path, extension, size = normalize_upload(self.path, self.extension, self.size, incoming_dir())
+        if path == self.path:
+            sha256 = self._digest.hexdigest()
+        else:
+            # The normalized copy is now the staging file abort() cleans up
+            self.path = path
+            sha256, size = hash_file(path)
+        return store(path, sha256, extension, size)
+
+    def abort(self):
+        """Discard the staging file, if it has not been moved into the store"""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def stream_to_sink(read, content_length=None):
+    """Copy a file-like read() callable into a new ImageSink in fixed-size chunks"""
+    if content_length and content_length > settings.MAX_UPLOAD_SIZE:
+        raise _too_large()
+
+    sink = ImageSink()
+    try:
+        while True:
+            chunk = read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            sink.write(chunk)
+        return sink.close()
+    except BaseException:
+        sink.abort()
+        raise
+
+
+def decode_base64_to_sink(image_data):
+    """Decode a (possibly data: URL prefixed) base64 string to disk one slice at a time"""
+    if ',' in image_data[:100]:
+        image_data = image_data.split(',', 1)[1]
+    if any(c in image_data for c in ' \r\n\t'):
+        image_data = ''.join(image_data.split())
+
+    # Reject on the encoded length before decoding anything
+    if len(image_data) // 4 * 3 > settings.MAX_UPLOAD_SIZE + 3:
+        raise _too_large()
+
+    # Slices are a multiple of 4 characters so each decodes independently
+    step = settings.UPLOAD_CHUNK_SIZE // 3 * 4
+    sink = ImageSink()
+    try:
+        for offset in range(0, len(image_data), step):
+            try:
+                sink.write(binascii.a2b_base64(image_data[offset:offset + step]))
+            except binascii.Error as e:
+                raise UploadRejected('Invalid image data') from e
+        return sink.close()
+    except BaseException:
+        sink.abort()
+        raise
+
+
+class ReceiptImageUploadHandler(FileUploadHandler):
+    """
+    Multipart upload handler that streams the `image` field into an ImageSink.
+
+    Rejections stop the parse immediately; the reason is kept on the
+    handler so the view can answer with it.
+    """
+
+    chunk_size = None
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.chunk_size = settings.UPLOAD_CHUNK_SIZE
+        self.error = None
+        self.sink = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Image plus a few small text fields; anything far larger is refused
+        # unread by handing back an empty parse result
+        if content_length and content_length > settings.MAX_UPLOAD_SIZE + 64 * 1024:
+            self.error = _too_large()
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != 'image' or self.sink is not None:
+            self.error = UploadRejected('Only one image field is accepted')
+            raise StopUpload(connection_reset=True)
+        self.sink = ImageSink()
+
+    def receive_data_chunk(self, raw_data, start):
+        try:
+            self.sink.write(raw_data)
+        except UploadRejected as e:
+            self.error = e
+            self.sink.abort()
+            raise StopUpload(connection_reset=True)
+        return None
+
+    def file_complete(self, file_size):
+        try:
+            return self.sink.close()
+        except UploadRejected as e:
+            self.error = e
+            raise StopUpload(connection_reset=True)
+
+    def upload_interrupted(self):
+        if self.sink is not None:
+            self.sink.abort()
@@ -7,5 +7,10 @@ from . import views
 urlpatterns = [
     path('', views.receipts_list, name='receipts_list'),
     path('export/', views.export_receipts, name='export_receipts'),
+    path('exports/', views.export_job_list, name='export_job_list'),
+    path('exports/<int:job_id>/', views.export_job_detail, name='export_job_detail'),
+    path('exports/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
     path('<int:receipt_id>/', views.receipt_detail, name='receipt_detail'),
+    path('<int:receipt_id>/image/', views.receipt_image, name='receipt_image'),
+    path('<int:receipt_id>/image/url/', views.receipt_image_url, name='receipt_image_url'),
 ]
@@ -1,20 +1,43 @@
 """
 Receipt views
 """
-import base64
-import os
-import uuid
-import csv
 import io
-from datetime import datetime
+import os
+from datetime import datetime, timezone as dt_timezone
 from django.conf import settings
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from .models import Receipt
+from apps.users.versioning import etag_on_data_version
+from . import blobstore, columnar, derivatives, media, rollups
+from .archive import MANIFEST_COLUMNS, iter_zip
+from .export_jobs import delete_artifact, request_export
+from .exports import (
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    InvalidFilters,
+    csv_rows,
+    export_filename,
+    export_queryset,
+    iter_rows,
+    json_head,
+    parse_filters,
+    write_pdf,
+)
+from .models import ExportJob, Receipt
+from .pagination import KEYSET_ORDERING, InvalidCursor, paginate_receipts
+from .read_models import KEYSET_COLUMNS, InvalidFields, ReceiptProjection
 from .serializers import ReceiptCreateSerializer, ReceiptUpdateSerializer
+from .streaming import iter_csv, streaming_json_response
+from .uploads import (
+    ReceiptImageUploadHandler,
+    UploadRejected,
+    decode_base64_to_sink,
+    stream_to_sink,
+)
 
 
 @api_view(['GET', 'POST'])
@@ -25,8 +48,9 @@ def receipts_list(request):
     return create_receipt(request)
 
 
+@etag_on_data_version
 def get_receipts(request):
-    """Get all receipts for current user"""
+    """Get receipts for current user, one keyset page at a time when limit or cursor is set"""
     user = request.user
     
     # Optional query parameters
@@ -46,116 +70,165 @@ def get_receipts(request):
     if end_date:
         queryset = queryset.filter(date__lte=end_date)
     
-    queryset = queryset.order_by('-date')
-    
-    if limit:
-        try:
-            queryset = queryset[:int(limit)]
-        except ValueError:
-            pass
-    
-    receipts = [r.to_dict() for r in queryset]
-    return Response({'receipts': receipts})
-
-
-def create_receipt(request):
-    """Create a new receipt"""
-    serializer = ReceiptCreateSerializer(data=request.data)
-    
-    if not serializer.is_valid():
-        errors = serializer.errors
-        first_error = next(iter(errors.values()))[0]
-        return Response({'error': str(first_error)}, status=status.HTTP_400_BAD_REQUEST)
+    cursor = request.query_params.get('cursor')
     
-    data = serializer.validated_data
+    try:
+        projection = ReceiptProjection.from_param(
+            request.query_params.get('fields'),
+            extra_columns=KEYSET_COLUMNS if limit or cursor else (),
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Handle image upload
-    image_url = None
-    image_data = data.get('imageData')
+    rows = projection.rows(queryset)
     
-    if image_data:
+    if limit or cursor:
         try:
-            # Parse base64 data
-            if ',' in image_data:
-                header, image_data = image_data.split(',', 1)
-            
-            # Decode base64
-            image_bytes = base64.b64decode(image_data)
-            
-            # Generate unique filename
-            filename = f"{uuid.uuid4()}.jpg"
-            
-            # Create uploads directory if it doesn't exist
-            os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
-            
-            # Save the image
-            filepath = os.path.join(settings.MEDIA_ROOT, filename)
-            with open(filepath, 'wb') as f:
-                f.write(image_bytes)
-            
-            image_url = f"/uploads/{filename}"
-        except Exception as e:
-            print(f"Error saving image: {e}")
-    
-    # Create receipt
-    receipt = Receipt.objects.create(
-        user=request.user,
-        name=data['name'],
-        amount=data['amount'],
-        category=data['category'],
-        date=data['date'],
-        image_url=image_url,
-        notes=data.get('notes', '')
-    )
+            page, next_cursor, prev_cursor = paginate_receipts(
+                rows, cursor, limit, key=projection.keyset_key
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'receipts': [projection.to_dict(r) for r in page],
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor,
+        })
     
-    # Check budget alerts after adding a receipt
-    alerts_created = check_and_create_budget_alerts(request.user, data['category'])
+    rows = rows.order_by(*KEYSET_ORDERING)
     
-    response_data = {'receipt': receipt.to_dict()}
-    if alerts_created:
-        response_data['budget_alerts'] = alerts_created
+    if request.query_params.get('stream') in ('1', 'true'):
+        return streaming_json_response({}, 'receipts', rows, projection.to_dict)
     
-    return Response(response_data, status=status.HTTP_201_CREATED)
+    receipts = [projection.to_dict(r) for r in rows]
+    return Response({'receipts': receipts})
 
 
-def check_and_create_budget_alerts(user, category=None):
-    """Check all relevant budgets and create alerts if thresholds are met"""
-    from apps.users.models import Budget
-    from apps.users.budget_views import check_budget_alerts
-    
-    alerts_created = []
-    
-    # Get all active budgets for this user
-    budgets = Budget.objects.filter(user=user, is_active=True)
-    
-    for budget in budgets:
-        # Check overall budgets (category=None) and category-specific budgets
-        if budget.category is None or budget.category == category:
-            alert = check_budget_alerts(user, budget)
-            if alert:
-                alerts_created.append(alert.to_dict())
+def create_receipt(request):
+    """Create a new receipt, with an optional multipart `image` file or legacy base64 imageData"""
+    # Multipart images stream straight to disk while the form is parsed
+    upload = ReceiptImageUploadHandler(request._request)
+    request._request.upload_handlers = [upload]
     
-    return alerts_created
+    image = None
+    try:
+        serializer = ReceiptCreateSerializer(data=request.data)
+        
+        if upload.error:
+            return Response({'error': str(upload.error)}, status=upload.error.status_code)
+        
+        image = request.FILES.get('image')
+        
+        if not serializer.is_valid():
+            errors = serializer.errors
+            first_error = next(iter(errors.values()))[0]
+            return Response({'error': str(first_error)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        
+        # Handle legacy base64 image upload
+        image_data = data.get('imageData')
+        if image_data and not image:
+            try:
+                image = decode_base64_to_sink(image_data)
+            except UploadRejected as e:
+                return Response({'error': str(e)}, status=e.status_code)
+        
+        image_blob = image.save() if image else None
+        
+        # Create receipt
+        with transaction.atomic():
+            receipt = Receipt.objects.create(
+                user=request.user,
+                name=data['name'],
+                amount=data['amount'],
+                category=data['category'],
+                date=data['date'],
+                image_url=image_blob.url if image_blob else None,
+                image_blob=image_blob,
+                notes=data.get('notes', '')
+            )
+            blobstore.acquire(image_blob)
+            rollups.add_receipt(receipt)
+        
+            # Check budget alerts after adding a receipt
+            alerts_created = check_and_create_budget_alerts(
+                request.user, new=(receipt.date, receipt.category, receipt.amount)
+            )
+        
+        derivatives.schedule(image_blob)
+        
+        response_data = {'receipt': receipt.to_dict()}
+        if alerts_created:
+            response_data['budget_alerts'] = alerts_created
+        
+        return Response(response_data, status=status.HTTP_201_CREATED)
+    finally:
+        # Staging files are moved into the store on success; on every other
+        # path (rejections, parse errors, a second file field) drop them here
+        for sink in (upload.sink, image):
+            if sink is not None:
+                sink.abort()
+
+
+def check_and_create_budget_alerts(user, old=None, new=None):
+    """
+    Update budget period state for a receipt change and check for threshold alerts.
+
+    old and new are the receipt's (date, category, amount) before and after
+    the write. Must run in the receipt's transaction. With async alerts the
+    check is queued for the alert worker and nothing is returned; clients
+    pick the alerts up from /api/budgets/alerts/.
+    """
+    from apps.users.alert_jobs import enqueue_alert_evaluation
+    from apps.users.budget_state import apply_receipt_change, raise_threshold_alerts
+    
+    budgets = apply_receipt_change(user, old, new)
+    if not budgets:
+        return []
+    
+    if settings.BUDGET_ALERTS_ASYNC:
+        enqueue_alert_evaluation(user.id)
+        return []
+    
+    alerts_created = raise_threshold_alerts(budgets)
+    return [alert.to_dict() for alert in alerts_created]
 
 
 @api_view(['GET', 'PUT', 'DELETE'])
 def receipt_detail(request, receipt_id):
     """Get, update or delete a specific receipt"""
+    if request.method == 'GET':
+        try:
+            projection = ReceiptProjection.from_param(request.query_params.get('fields'))
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        row = projection.rows(Receipt.objects.filter(id=receipt_id, user=request.user)).first()
+        if row is None:
+            return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'receipt': projection.to_dict(row)})
+    
+    return modify_receipt(request, receipt_id)
+
+
+@transaction.atomic
+def modify_receipt(request, receipt_id):
+    """Update or delete a receipt together with its rollup rows"""
     try:
-        receipt = Receipt.objects.get(id=receipt_id, user=request.user)
+        receipt = Receipt.objects.select_for_update().get(id=receipt_id, user=request.user)
     except Receipt.DoesNotExist:
         return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    if request.method == 'GET':
-        return Response({'receipt': receipt.to_dict()})
-    
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = ReceiptUpdateSerializer(data=request.data)
         
         if not serializer.is_valid():
             return Response({'error': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
+        previous = (receipt.date, receipt.category, receipt.amount)
         
         if 'name' in data:
             receipt.name = data['name']
@@ -165,217 +238,279 @@ def receipt_detail(request, receipt_id):
             receipt.category = data['category']
         if 'date' in data:
             receipt.date = data['date']
-        if 'imageUrl' in data:
-            receipt.image_url = data['imageUrl'] if data['imageUrl'] else None
+        if 'imageUrl' in data and (data['imageUrl'] or None) != receipt.image_url:
+            receipt.image_url = data['imageUrl'] or None
+            blobstore.release(receipt.image_blob_id)
+            receipt.image_blob = blobstore.blob_for_url(receipt.image_url, request.user)
+            blobstore.acquire(receipt.image_blob)
         if 'notes' in data:
             receipt.notes = data['notes']
         
         receipt.save()
-        return Response({'receipt': receipt.to_dict()})
+        
+        current = (receipt.date, receipt.category, receipt.amount)
+        alerts_created = None
+        if previous != current:
+            previous_date, previous_category, previous_amount = previous
+            rollups.apply_delta(receipt.user_id, previous_date, previous_category, -previous_amount, -1)
+            rollups.add_receipt(receipt)
+            alerts_created = check_and_create_budget_alerts(request.user, old=previous, new=current)
+        
+        response_data = {'receipt': receipt.to_dict()}
+        if alerts_created:
+            response_data['budget_alerts'] = alerts_created
+        return Response(response_data)
     
     elif request.method == 'DELETE':
+        rollups.remove_receipt(receipt)
+        check_and_create_budget_alerts(
+            request.user, old=(receipt.date, receipt.category, receipt.amount)
+        )
+        blobstore.release(receipt.image_blob_id)
         receipt.delete()
         return Response({'message': 'Receipt deleted successfully'})
 
 
-@api_view(['GET'])
-def export_receipts(request):
-    """Export receipts as CSV or PDF"""
-    user = request.user
+# ?variant= values for receipt image reads
+IMAGE_VARIANTS = ('original', 'preview', 'thumb')
+
+
+def image_variant_path(blob, variant):
+    """Stored path of a blob's variant, falling back to the original until derivatives are ready"""
+    if variant == 'preview' and blob.preview:
+        return blob.preview
+    if variant == 'thumb' and blob.thumbnail:
+        return blob.thumbnail
+    return blob.path
+
+
+@api_view(['GET', 'PUT'])
+def receipt_image(request, receipt_id):
+    """Download a receipt's image, or attach or replace it from the raw request body"""
+    try:
+        receipt = Receipt.objects.select_related('image_blob').get(id=receipt_id, user=request.user)
+    except Receipt.DoesNotExist:
+        return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Optional query parameters for filtering
-    category = request.query_params.get('category')
-    start_date = request.query_params.get('start_date')
-    end_date = request.query_params.get('end_date')
-    format_type = request.query_params.get('format', 'csv')
+    if request.method == 'GET':
+        return get_receipt_image(request, receipt)
     
-    queryset = Receipt.objects.filter(user=user)
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
     
-    if category:
-        queryset = queryset.filter(category=category)
+    # Read the body in chunks from the underlying request, bypassing DRF's parsers
+    try:
+        image = stream_to_sink(request._request.read, content_length)
+    except UploadRejected as e:
+        return Response({'error': str(e)}, status=e.status_code)
     
-    if start_date:
-        queryset = queryset.filter(date__gte=start_date)
+    try:
+        image_blob = image.save()
+        
+        with transaction.atomic():
+            receipt = Receipt.objects.select_for_update().get(id=receipt.id)
+            if receipt.image_blob_id != image_blob.pk:
+                blobstore.release(receipt.image_blob_id)
+                blobstore.acquire(image_blob)
+            receipt.image_blob = image_blob
+            receipt.image_url = image_blob.url
+            receipt.save(update_fields=['image_url', 'image_blob', 'updated_at'])
+    finally:
+        # The staging file has been moved into the store on success
+        image.abort()
+    
+    derivatives.schedule(image_blob)
+    return Response({'receipt': receipt.to_dict()})
+
+
+def get_receipt_image(request, receipt):
+    """Serve a receipt's image after the ownership check"""
+    variant = request.query_params.get('variant', 'original')
+    if variant not in IMAGE_VARIANTS:
+        return Response({'error': 'Invalid variant. Use original, preview, or thumb'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    blob = receipt.image_blob
+    if blob is None:
+        return Response({'error': 'Image not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    path = image_variant_path(blob, variant)
+    etag = '"' + os.path.splitext(os.path.basename(path))[0] + '"'
+    
+    # This URL keeps working when the image is replaced, so it is only
+    # cacheable forever when pinned to the current content with ?v=<sha256>
+    if request.query_params.get('v') == blob.sha256:
+        cache_control = media.IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = media.REVALIDATE_CACHE_CONTROL
+    return media.serve_media(request._request, path, etag, cache_control)
+
+
+@api_view(['GET'])
+def receipt_image_url(request, receipt_id):
+    """Issue a short-lived signed URL for a receipt's image"""
+    receipt = Receipt.objects.select_related('image_blob').filter(id=receipt_id, user=request.user).first()
+    if receipt is None:
+        return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
+    if receipt.image_blob is None:
+        return Response({'error': 'Image not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    if end_date:
-        queryset = queryset.filter(date__lte=end_date)
+    variant = request.query_params.get('variant', 'original')
+    if variant not in IMAGE_VARIANTS:
+        return Response({'error': 'Invalid variant. Use original, preview, or thumb'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    url, expires = media.signed_url(image_variant_path(receipt.image_blob, variant))
+    return Response({'url': url, 'expires_at': datetime.fromtimestamp(expires, dt_timezone.utc).isoformat()})
+
+
+def check_export_format(format_type):
+    """Error response for an unknown export format or one this server cannot produce, else None"""
+    if format_type not in EXPORT_FORMATS:
+        return Response(
+            {'error': 'Invalid format. Use csv, pdf, json, zip, parquet, or arrow'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if format_type in columnar.COLUMNAR_FORMATS and not columnar.available():
+        return Response(
+            {'error': 'Parquet and Arrow exports are not available on this server'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    return None
+
+
+@api_view(['GET'])
+def export_receipts(request):
+    """Export receipts as CSV, PDF, JSON, Parquet, Arrow or a ZIP with images, or queue an export job for large result sets"""
+    format_type = request.query_params.get('format', 'csv')
+    error = check_export_format(format_type)
+    if error is not None:
+        return error
+    
+    # Optional query parameters for filtering
+    try:
+        filters = parse_filters(request.query_params)
+    except InvalidFilters as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    queryset = export_queryset(request.user.id, filters)
+    start_date = filters.get('start_date')
+    end_date = filters.get('end_date')
     
-    queryset = queryset.order_by('-date')
+    # Too large to render within the request timeout: hand it to the export worker
+    max_rows = settings.EXPORT_SYNC_MAX_ROWS.get(format_type)
+    if max_rows is not None and queryset.count() > max_rows:
+        job, created = request_export(request.user.id, format_type, filters)
+        return Response({'job': job.to_dict()}, status=status.HTTP_202_ACCEPTED)
     
     if format_type == 'csv':
         return export_csv(queryset, start_date, end_date)
     elif format_type == 'pdf':
         return export_pdf(queryset, start_date, end_date)
-    elif format_type == 'json':
-        return export_json(queryset)
+    elif format_type == 'zip':
+        return export_zip(queryset, start_date, end_date)
+    elif format_type in columnar.COLUMNAR_FORMATS:
+        return export_columnar(format_type, queryset, start_date, end_date)
     else:
-        return Response({'error': 'Invalid format. Use csv, pdf, or json'}, status=status.HTTP_400_BAD_REQUEST)
+        return export_json(queryset, ReceiptProjection.from_param(filters.get('fields')))
 
 
-def export_csv(queryset, start_date=None, end_date=None):
-    """Export receipts as CSV file"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['Date', 'Name', 'Category', 'Amount', 'Notes'])
-    
-    # Write data
-    total = 0
-    for receipt in queryset:
-        writer.writerow([
-            receipt.date.isoformat() if receipt.date else '',
-            receipt.name,
-            receipt.category,
-            float(receipt.amount),
-            receipt.notes or ''
-        ])
-        total += float(receipt.amount)
-    
-    # Write summary
-    writer.writerow([])
-    writer.writerow(['', '', 'Total:', total, ''])
-    
-    # Create response
-    output.seek(0)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    
-    # Add date range to filename if specified
-    date_range = ''
-    if start_date and end_date:
-        date_range = f'_{start_date}_to_{end_date}'
-    elif start_date:
-        date_range = f'_from_{start_date}'
-    elif end_date:
-        date_range = f'_to_{end_date}'
-    
-    filename = f'receipts_export{date_range}_{timestamp}.csv'
-    
-    response = HttpResponse(output.getvalue(), content_type='text/csv')
+def attachment(response, filename):
+    """Mark a response as a download named filename"""
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     response['Access-Control-Expose-Headers'] = 'Content-Disposition'
-    
     return response
 
 
+def export_csv(queryset, start_date=None, end_date=None):
+    """Export receipts as a CSV file, streamed as rows are read from the database"""
+    response = StreamingHttpResponse(iter_csv(csv_rows(iter_rows(queryset))), content_type='text/csv')
+    return attachment(response, export_filename('csv', start_date, end_date))
+
+
 def export_pdf(queryset, start_date=None, end_date=None):
     """Export receipts as PDF file"""
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    
-    # Create PDF buffer
     buffer = io.BytesIO()
+    write_pdf(buffer, iter_rows(queryset), start_date, end_date)
     
-    # Create document
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=12,
-        textColor=colors.HexColor('#10b981')
+    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    return attachment(response, export_filename('pdf', start_date, end_date))
+
+
+def export_zip(queryset, start_date=None, end_date=None):
+    """Export receipts and their images as a ZIP archive, streamed as it is written"""
+    rows = iter_rows(queryset, MANIFEST_COLUMNS)
+    response = StreamingHttpResponse(iter_zip(queryset, rows), content_type='application/zip')
+    return attachment(response, export_filename('zip', start_date, end_date))
+
+
+def export_columnar(format_type, queryset, start_date=None, end_date=None):
+    """Export receipts as a Parquet or Arrow IPC file, streamed one record batch at a time"""
+    rows = iter_rows(queryset, columnar.COLUMNAR_COLUMNS)
+    response = StreamingHttpResponse(
+        columnar.iter_columnar(format_type, rows),
+        content_type=CONTENT_TYPES[format_type],
     )
-    elements.append(Paragraph('Fint - Receipt Export', title_style))
-    
-    # Date range subtitle
-    if start_date or end_date:
-        date_text = f"Period: {start_date or 'Beginning'} to {end_date or 'Present'}"
-        elements.append(Paragraph(date_text, styles['Normal']))
-    
-    elements.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
-    elements.append(Spacer(1, 20))
-    
-    # Table data
-    data = [['Date', 'Name', 'Category', 'Amount', 'Notes']]
-    total = 0
-    
-    for receipt in queryset:
-        data.append([
-            receipt.date.strftime('%Y-%m-%d') if receipt.date else '',
-            receipt.name[:30] + '...' if len(receipt.name) > 30 else receipt.name,
-            receipt.category,
-            f"${float(receipt.amount):.2f}",
-            (receipt.notes or '')[:20] + '...' if receipt.notes and len(receipt.notes) > 20 else (receipt.notes or '')
-        ])
-        total += float(receipt.amount)
-    
-    # Add total row
-    data.append(['', '', '', f"${total:.2f}", 'TOTAL'])
-    
-    # Create table
-    table = Table(data, colWidths=[1.2*inch, 1.8*inch, 1.3*inch, 1*inch, 1.5*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10b981')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.white),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f0fdf4')),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    elements.append(table)
-    
-    # Add summary
-    elements.append(Spacer(1, 20))
-    summary_text = f"Total Receipts: {len(list(queryset))} | Total Amount: ${total:.2f}"
-    elements.append(Paragraph(summary_text, styles['Normal']))
-    
-    # Build PDF
-    doc.build(elements)
-    
-    # Create response
-    buffer.seek(0)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    
-    date_range = ''
-    if start_date and end_date:
-        date_range = f'_{start_date}_to_{end_date}'
-    elif start_date:
-        date_range = f'_from_{start_date}'
-    elif end_date:
-        date_range = f'_to_{end_date}'
-    
-    filename = f'receipts_export{date_range}_{timestamp}.pdf'
+    return attachment(response, export_filename(format_type, start_date, end_date))
+
+
+def export_json(queryset, projection):
+    """Export receipts as JSON, streamed with totals computed in the database"""
+    return streaming_json_response(
+        json_head(queryset), 'receipts', projection.rows(queryset), projection.to_dict
+    )
+
+
+@api_view(['GET', 'POST'])
+def export_job_list(request):
+    """List recent export jobs or request a new one"""
+    if request.method == 'GET':
+        jobs = ExportJob.objects.filter(user=request.user)[:20]
+        return Response({'jobs': [job.to_dict() for job in jobs]})
     
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    response['Access-Control-Expose-Headers'] = 'Content-Disposition'
+    format_type = request.data.get('format', 'csv')
+    error = check_export_format(format_type)
+    if error is not None:
+        return error
     
-    return response
+    try:
+        filters = parse_filters(request.data)
+    except InvalidFilters as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    job, created = request_export(request.user.id, format_type, filters)
+    response_status = status.HTTP_200_OK if job.status == ExportJob.STATUS_DONE else status.HTTP_202_ACCEPTED
+    return Response({'job': job.to_dict()}, status=response_status)
 
 
-def export_json(queryset):
-    """Export receipts as JSON"""
-    receipts = [r.to_dict() for r in queryset]
-    
-    # Calculate summary
-    total_amount = sum(r['amount'] for r in receipts)
-    categories = {}
-    for r in receipts:
-        cat = r['category']
-        categories[cat] = categories.get(cat, 0) + r['amount']
+@api_view(['GET', 'DELETE'])
+def export_job_detail(request, job_id):
+    """Get an export job's status and progress, or delete it and its file"""
+    try:
+        job = ExportJob.objects.get(id=job_id, user=request.user)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    export_data = {
-        'export_date': datetime.now().isoformat(),
-        'total_receipts': len(receipts),
-        'total_amount': total_amount,
-        'by_category': categories,
-        'receipts': receipts
-    }
+    if request.method == 'DELETE':
+        delete_artifact(job)
+        job.delete()
+        return Response({'message': 'Export deleted successfully'})
     
-    return Response(export_data)
+    return Response({'job': job.to_dict()})
+
+
+@api_view(['GET'])
+def export_job_download(request, job_id):
+    """Download a finished export"""
+    job = ExportJob.objects.filter(id=job_id, user=request.user).first()
+    if job is None:
+        return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != ExportJob.STATUS_DONE:
+        return Response({'error': 'Export is not ready'}, status=status.HTTP_409_CONFLICT)
+    
+    # A job's artifact never changes once written
+    etag = f'"export-{job.id}-{job.fingerprint[:16]}"'
+    response = media.serve_media(request._request, job.file_path, etag)
+    if response.status_code == 200:
+        attachment(response, job.filename)
+    return response
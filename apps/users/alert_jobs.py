@@ -0,0 +1,84 @@
+"""
+Durable queue for budget alert evaluation
+
+Receipt writes enqueue a job row for the user inside their own
+transaction. Repeated requests for the same user fold into that one row,
+so a burst of inserts leads to a single evaluation. run_alert_worker
+claims due rows with SELECT ... FOR UPDATE SKIP LOCKED and evaluates them.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .budget_state import get_period_date_range, is_stale, lock_budgets, raise_threshold_alerts, reseed_states
+from .models import AlertJob
+
+
+def enqueue_alert_evaluation(user_id):
+    """Request an alert evaluation for a user, coalescing with any queued request"""
+    table = connection.ops.quote_name(AlertJob._meta.db_table)
+    now = timezone.now()
+    run_after = now + timedelta(seconds=settings.ALERT_JOB_COALESCE_SECONDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, generation, run_after, attempts, last_error, created_at) "
+            f"VALUES (%s, 1, %s, 0, '', %s) "
+            f"ON CONFLICT (user_id) DO UPDATE SET generation = {table}.generation + 1",
+            [user_id, run_after, now],
+        )
+
+
+def evaluate_user_alerts(user_id):
+    """Refresh every active budget's period state and raise alerts for new threshold crossings"""
+    with transaction.atomic():
+        budgets = lock_budgets(user_id)
+        reseed_states(
+            user_id,
+            [b for b in budgets if is_stale(b, get_period_date_range(b.period)[0])],
+        )
+        return raise_threshold_alerts(budgets)
+
+
+def claim_jobs(limit):
+    """Lease up to limit due jobs to this worker; returns (user_id, generation) pairs"""
+    now = timezone.now()
+    lease = timedelta(seconds=settings.ALERT_JOB_LEASE_SECONDS)
+    with transaction.atomic():
+        jobs = list(
+            AlertJob.objects.select_for_update(skip_locked=True)
+            .filter(run_after__lte=now)
+            .exclude(locked_until__gt=now)
+            .order_by('run_after')
+            .values_list('user_id', 'generation')[:limit]
+        )
+        if jobs:
+            AlertJob.objects.filter(user_id__in=[user_id for user_id, _ in jobs]).update(
+                locked_until=now + lease
+            )
+    return jobs
+
+
+def run_job(user_id, generation):
+    """Evaluate one claimed job, then retire it or schedule a retry"""
+    try:
+        alerts = evaluate_user_alerts(user_id)
+    except Exception:
+        attempts = AlertJob.objects.filter(user_id=user_id).values_list('attempts', flat=True).first() or 0
+        backoff = min(settings.ALERT_JOB_RETRY_SECONDS * 2 ** attempts, 3600)
+        AlertJob.objects.filter(user_id=user_id).update(
+            attempts=attempts + 1,
+            run_after=timezone.now() + timedelta(seconds=backoff),
+            locked_until=None,
+            last_error=traceback.format_exc()[-2000:],
+        )
+        raise
+
+    # Requests that arrived while we were running bumped the generation and
+    # keep the row queued for another pass.
+    retired = AlertJob.objects.filter(user_id=user_id, generation=generation).delete()[0]
+    if not retired:
+        AlertJob.objects.filter(user_id=user_id).update(locked_until=None, attempts=0)
+    return alerts
@@ -0,0 +1,12 @@
+"""
+Users app configuration
+"""
+from django.apps import AppConfig
+
+
+class UsersConfig(AppConfig):
+    name = 'apps.users'
+    label = 'users'
+
+    def ready(self):
+        from . import signals  # noqa: F401
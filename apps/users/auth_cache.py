@@ -0,0 +1,156 @@
+"""
+Cache of authenticated users
+
+JWT authentication resolves the token's user_id through a per-process LRU
+cache (AUTH_CACHE_MAX_ENTRIES entries kept for AUTH_CACHE_TTL_SECONDS),
+then an optional shared cache (AUTH_CACHE_ALIAS), and only then the
+database. Only the columns requests need are cached; the password hash
+is never stored and loads on first access.
+
+Saving or deleting a user drops its entries after the transaction
+commits. Other workers' local entries expire within the TTL, but a token
+whose `tv` claim is newer than the cached token_version always forces a
+fresh read, so tokens issued after a password change work at once.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from fint_backend.metrics import increment
+
+from .models import User
+
+
+# In model field order, which Model.from_db() expects for a partial row
+CACHED_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in (
+        'id', 'email', 'name', 'avatar_url', 'is_active', 'is_staff', 'is_superuser',
+        'last_login', 'created_at', 'updated_at', 'token_version',
+    )
+)
+
+
+class LocalCache:
+    """Thread-safe LRU mapping whose entries expire ttl seconds after being set"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = LocalCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def _shared():
+    alias = settings.AUTH_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def _load(user_id):
+    """Cached columns for a user from the database, or None if there is no such user"""
+    return User.objects.filter(id=user_id).values_list(*CACHED_FIELDS).first()
+
+
+def _to_user(values):
+    # A fresh instance per request; fields outside CACHED_FIELDS load on access
+    return User.from_db('default', CACHED_FIELDS, values)
+
+
+def get_user(user_id, refresh=False):
+    """The user with user_id, from the fastest tier that has it; None if it does not exist"""
+    key = _cache_key(user_id)
+    shared = _shared()
+
+    if not refresh:
+        values = _local.get(key)
+        if values is not None:
+            increment('auth_cache_local_hits')
+            return _to_user(values)
+
+        if shared is not None:
+            values = shared.get(key)
+            if values is not None:
+                increment('auth_cache_shared_hits')
+                _local.set(key, values)
+                return _to_user(values)
+
+    increment('auth_cache_misses')
+    values = _load(user_id)
+    if values is None:
+        return None
+
+    _local.set(key, values)
+    if shared is not None:
+        shared.set(key, values, settings.AUTH_CACHE_SHARED_TTL_SECONDS)
+    return _to_user(values)
+
+
+def _invalidate(user_id):
+    key = _cache_key(user_id)
+    _local.delete(key)
+    shared = _shared()
+    if shared is not None:
+        shared.delete(key)
+
+
+def invalidate(user_id):
+    """Drop a user's cached state once the surrounding transaction commits"""
+    transaction.on_commit(lambda: _invalidate(user_id))
+
+
+def bump_token_version(user):
+    """
+    Invalidate every token issued to user so far, setting user.token_version
+    to the new value for the token that replaces them.
+
+    Incremented in the database rather than from user, which may come from
+    a cache and lag behind; other workers' cached users keep accepting the
+    old tokens for up to AUTH_CACHE_TTL_SECONDS.
+    """
+    User.objects.filter(pk=user.pk).update(
+        token_version=F('token_version') + 1, updated_at=timezone.now()
+    )
+    user.token_version = User.objects.filter(pk=user.pk).values_list('token_version', flat=True).get()
+    invalidate(user.pk)
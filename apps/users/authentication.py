@@ -2,23 +2,41 @@
 JWT Authentication for REST Framework
 """
 import jwt
+import secrets
 from datetime import datetime, timedelta
 from django.conf import settings
 from rest_framework import authentication, exceptions
 
-from .models import User
+from . import auth_cache
+from .revocation import is_revoked
 
 
 def generate_token(user):
     """Generate JWT token for user"""
     payload = {
         'user_id': user.id,
+        'tv': user.token_version,
+        'jti': secrets.token_urlsafe(16),
         'exp': datetime.utcnow() + timedelta(days=settings.JWT_EXPIRATION_DAYS),
         'iat': datetime.utcnow()
     }
     return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
+def decode_token(token):
+    """Verified payload of a token; raises AuthenticationFailed"""
+    try:
+        return jwt.decode(
+            token, 
+            settings.JWT_SECRET_KEY, 
+            algorithms=[settings.JWT_ALGORITHM]
+        )
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed('Token has expired')
+    except jwt.InvalidTokenError:
+        raise exceptions.AuthenticationFailed('Invalid token')
+
+
 class JWTAuthentication(authentication.BaseAuthentication):
     """JWT token authentication"""
     
@@ -35,23 +53,28 @@ class JWTAuthentication(authentication.BaseAuthentication):
         except ValueError:
             return None
         
-        try:
-            payload = jwt.decode(
-                token, 
-                settings.JWT_SECRET_KEY, 
-                algorithms=[settings.JWT_ALGORITHM]
-            )
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed('Token has expired')
-        except jwt.InvalidTokenError:
-            raise exceptions.AuthenticationFailed('Invalid token')
+        payload = decode_token(token)
         
-        try:
-            user = User.objects.get(id=payload['user_id'])
-        except User.DoesNotExist:
+        # Tokens issued before jti was introduced can only be revoked by token_version
+        if payload.get('jti') and is_revoked(payload['jti']):
+            raise exceptions.AuthenticationFailed('Token has been revoked')
+        
+        user = auth_cache.get_user(payload['user_id'])
+        if user is None:
             raise exceptions.AuthenticationFailed('User not found')
         
+        # Tokens issued before token_version was introduced carry no claim
+        token_version = payload.get('tv', 0)
+        if token_version > user.token_version:
+            # Issued after the cached state was read (e.g. by another worker)
+            user = auth_cache.get_user(payload['user_id'], refresh=True)
+            if user is None:
+                raise exceptions.AuthenticationFailed('User not found')
+        if token_version != user.token_version:
+            raise exceptions.AuthenticationFailed('Token has been revoked')
+        
         if not user.is_active:
             raise exceptions.AuthenticationFailed('User account is disabled')
         
-        return (user, token)
+        # request.auth is the verified payload, so views need not decode the token again
+        return (user, payload)
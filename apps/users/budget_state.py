@@ -0,0 +1,177 @@
+"""
+Incremental per-budget period state
+
+Each budget keeps the running spend of its current period in
+BudgetPeriodState. Receipt writes adjust it with F() updates inside the
+receipt transaction, so threshold checks read one row per budget instead
+of re-aggregating the period. A state whose period_start is behind the
+current period is reseeded lazily from the daily rollup.
+"""
+from decimal import Decimal
+
+from django.db.models import F, Q
+
+from .budget_views import (
+    LEVEL_OK,
+    budget_alert_level,
+    build_budget_alert,
+    calculate_spent_many,
+    get_period_date_range,
+)
+from .models import Budget, BudgetAlert, BudgetPeriodState
+from .versioning import bump_data_version
+
+
+def _delta_for(budget, start_date, end_date, changes):
+    """Net spend change a set of (date, category, amount, sign) entries makes to a budget"""
+    delta = Decimal('0.00')
+    for receipt_date, category, amount, sign in changes:
+        if start_date <= receipt_date <= end_date and budget.category in (None, category):
+            delta += sign * amount
+    return delta
+
+
+def lock_budgets(user, categories=None, active_only=True):
+    """
+    Lock and return a user's budgets, with their period state.
+
+    With categories, only overall budgets and budgets for those categories
+    are returned. Locking the budget rows serialises concurrent writers per
+    budget, so a lazy reseed and an F() increment can never both count one
+    receipt.
+    """
+    budgets = Budget.objects.select_for_update(of=('self',)).select_related('period_state').filter(
+        user=user
+    )
+    if active_only:
+        budgets = budgets.filter(is_active=True)
+    if categories is not None:
+        budgets = budgets.filter(Q(category__isnull=True) | Q(category__in=categories))
+    return list(budgets.order_by('id'))
+
+
+def is_stale(budget, start_date):
+    """Whether a budget's state is missing or belongs to an earlier period"""
+    state = getattr(budget, 'period_state', None)
+    return state is None or state.period_start != start_date
+
+
+def reseed_states(user, budgets):
+    """Recompute period state from the rollup for budgets whose period has rolled over"""
+    if not budgets:
+        return
+    spent = calculate_spent_many(user, budgets)
+    BudgetPeriodState.objects.bulk_create(
+        [
+            BudgetPeriodState(
+                budget=budget,
+                period_start=get_period_date_range(budget.period)[0],
+                spent=spent[budget.id],
+                alerted_level=LEVEL_OK,
+            )
+            for budget in budgets
+        ],
+        update_conflicts=True,
+        unique_fields=['budget'],
+        update_fields=['period_start', 'spent', 'alerted_level', 'updated_at'],
+    )
+
+
+def apply_receipt_change(user, old=None, new=None):
+    """
+    Move budget period state from a receipt's old values to its new ones.
+
+    old and new are (date, category, amount) tuples; pass only new for a
+    created receipt and only old for a deleted one. Must run inside the
+    transaction that wrote the receipt and its rollup rows. Only overall and
+    same-category budgets are touched, at most two per period, so the cost
+    does not grow with the number of budgets. Returns the budgets whose
+    state changed.
+    """
+    changes = []
+    if old:
+        changes.append((*old, -1))
+    if new:
+        changes.append((*new, 1))
+    categories = {category for _, category, _, _ in changes}
+
+    # Inactive budgets are tracked too, so reactivating one needs no reseed
+    stale = []
+    touched = []
+    for budget in lock_budgets(user, categories, active_only=False):
+        start_date, end_date = get_period_date_range(budget.period)
+        if is_stale(budget, start_date):
+            stale.append(budget)
+            continue
+        delta = _delta_for(budget, start_date, end_date, changes)
+        if delta:
+            BudgetPeriodState.objects.filter(budget=budget).update(spent=F('spent') + delta)
+            touched.append(budget)
+
+    # The rollup already includes this write, so the reseeded totals are current
+    reseed_states(user, stale)
+    return touched + stale
+
+
+def raise_threshold_alerts(budgets):
+    """
+    Create alerts for active budgets whose spend moved into a higher alert level.
+
+    Reads one state row per budget. Moving the recorded level up is a
+    conditional update, so concurrent writers raise each alert once, and
+    the alerts are written with one upsert against the (budget, alert_date)
+    unique constraint, so a budget never gets two alerts on the same day.
+    """
+    budgets = [budget for budget in budgets if budget.is_active]
+    if not budgets:
+        return []
+
+    states = {
+        budget_id: (spent, alerted_level)
+        for budget_id, spent, alerted_level in BudgetPeriodState.objects.filter(
+            budget__in=budgets
+        ).values_list('budget_id', 'spent', 'alerted_level')
+    }
+
+    alerts = []
+    for budget in budgets:
+        if budget.id not in states:
+            continue
+        spent, alerted_level = states[budget.id]
+        level = budget_alert_level(budget, spent)
+
+        if level < alerted_level:
+            # Spending dropped back (e.g. a receipt was deleted); allow the
+            # threshold to alert again if it is crossed later this period.
+            BudgetPeriodState.objects.filter(budget=budget).update(alerted_level=level)
+        elif level > alerted_level:
+            raised = BudgetPeriodState.objects.filter(
+                budget=budget, alerted_level__lt=level
+            ).update(alerted_level=level)
+            if raised:
+                alerts.append(build_budget_alert(budget, spent))
+
+    if alerts:
+        # Escalating from warning to exceeded on the same day replaces the
+        # earlier alert rather than adding a second one.
+        BudgetAlert.objects.bulk_create(
+            alerts,
+            update_conflicts=True,
+            unique_fields=['budget', 'alert_date'],
+            update_fields=['alert_type', 'message', 'current_spent', 'is_read'],
+        )
+        bump_data_version(budgets[0].user_id)
+
+    return alerts
+
+
+def reset_period_states(user_id=None, categories=None, budget=None):
+    """Drop period state so it is reseeded from the rollup on next use"""
+    states = BudgetPeriodState.objects.all()
+    if user_id is not None:
+        states = states.filter(budget__user_id=user_id)
+    if categories is not None:
+        states = states.filter(budget__category__in=categories)
+    if budget is not None:
+        states = states.filter(budget=budget)
+    states.delete()
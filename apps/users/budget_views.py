@@ -5,12 +5,14 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db import connection
+from django.db.models import Q, Sum
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
 from .models import Budget, BudgetAlert, User
+from .versioning import bump_data_version, etag_on_data_version
 
 
 def get_period_date_range(period):
@@ -38,11 +40,11 @@ def get_period_date_range(period):
 
 def calculate_spent(user, period, category=None):
     """Calculate amount spent in the given period"""
-    from apps.receipts.models import Receipt
+    from apps.receipts.models import DailySpending
     
     start_date, end_date = get_period_date_range(period)
     
-    queryset = Receipt.objects.filter(
+    queryset = DailySpending.objects.filter(
         user=user,
         date__gte=start_date,
         date__lte=end_date
@@ -51,47 +53,123 @@ def calculate_spent(user, period, category=None):
     if category:
         queryset = queryset.filter(category=category)
     
-    total = queryset.aggregate(total=Sum('amount'))['total']
+    total = queryset.aggregate(total=Sum('total'))['total']
     return total or Decimal('0.00')
 
 
-def check_budget_alerts(user, budget):
-    """Check if budget alerts need to be created"""
-    spent = calculate_spent(user, budget.period, budget.category)
-    percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
+def calculate_spent_many(user, budgets):
+    """
+    Calculate current-period spending for several budgets in one query.
+
+    Each distinct (period, category) pair becomes a SUM ... FILTER (WHERE ...)
+    over the user's rollup rows. Returns {budget.id: Decimal}.
+    """
+    from apps.receipts.models import DailySpending
     
-    # Check if we already sent an alert today for this budget
-    today = timezone.now().date()
-    existing_alert = BudgetAlert.objects.filter(
-        user=user,
-        budget=budget,
-        created_at__date=today
-    ).exists()
+    budgets = list(budgets)
+    aggregates = {}
+    aliases = {}
+    earliest = latest = None
+    
+    for budget in budgets:
+        key = (budget.period, budget.category)
+        if key not in aliases:
+            start_date, end_date = get_period_date_range(budget.period)
+            condition = Q(date__gte=start_date, date__lte=end_date)
+            if budget.category:
+                condition &= Q(category=budget.category)
+            alias = f'spent_{len(aliases)}'
+            aliases[key] = alias
+            aggregates[alias] = Sum('total', filter=condition)
+            earliest = start_date if earliest is None else min(earliest, start_date)
+            latest = end_date if latest is None else max(latest, end_date)
+    
+    if not aggregates:
+        return {}
     
-    if existing_alert:
-        return None
+    totals = DailySpending.objects.filter(
+        user=user,
+        date__gte=earliest,
+        date__lte=latest
+    ).aggregate(**aggregates)
     
-    alert = None
+    return {
+        budget.id: totals[aliases[(budget.period, budget.category)]] or Decimal('0.00')
+        for budget in budgets
+    }
+
+
+def budget_with_spending(budget, spent):
+    """Budget dict with current period spending attached"""
+    data = budget.to_dict()
+    data['current_spent'] = float(spent)
+    data['percentage'] = (data['current_spent'] / float(budget.amount) * 100) if budget.amount > 0 else 0
+    return data
+
+
+def upsert_budget(user_id, period, amount, category, alert_threshold):
+    """
+    Insert a budget or update the user's existing one for the same period and category.
+
+    A single INSERT ... ON CONFLICT against the (user, period, category)
+    unique index, so concurrent requests cannot race each other into an
+    IntegrityError or a duplicate overall budget.
+    """
+    table = connection.ops.quote_name(Budget._meta.db_table)
+    now = timezone.now()
+    budgets = Budget.objects.raw(
+        f"INSERT INTO {table} "
+        f"(user_id, period, amount, category, is_active, alert_threshold, created_at, updated_at) "
+        f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT (user_id, period, COALESCE(category, '')) DO UPDATE SET "
+        f"amount = EXCLUDED.amount, alert_threshold = EXCLUDED.alert_threshold, "
+        f"is_active = EXCLUDED.is_active, updated_at = EXCLUDED.updated_at "
+        f"RETURNING *",
+        [user_id, period, amount, category, True, alert_threshold, now, now],
+    )
+    return list(budgets)[0]
+
+
+# Alert levels tracked per budget period
+LEVEL_OK = 0
+LEVEL_WARNING = 1
+LEVEL_EXCEEDED = 2
+
+
+def budget_alert_level(budget, spent):
+    """How far spending has gone: OK, past the alert threshold, or over budget"""
+    percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
     if percentage >= 100:
-        category_text = f" for {budget.category}" if budget.category else ""
-        alert = BudgetAlert.objects.create(
-            user=user,
+        return LEVEL_EXCEEDED
+    if percentage >= budget.alert_threshold:
+        return LEVEL_WARNING
+    return LEVEL_OK
+
+
+def build_budget_alert(budget, spent):
+    """Unsaved alert describing the budget's current level, or None when within budget"""
+    level = budget_alert_level(budget, spent)
+    category_text = f" for {budget.category}" if budget.category else ""
+    
+    if level == LEVEL_EXCEEDED:
+        return BudgetAlert(
+            user_id=budget.user_id,
             budget=budget,
             alert_type='exceeded',
             message=f"You have exceeded your {budget.period} budget{category_text}! Spent ${spent:.2f} of ${budget.amount:.2f}",
             current_spent=spent
         )
-    elif percentage >= budget.alert_threshold:
-        category_text = f" for {budget.category}" if budget.category else ""
-        alert = BudgetAlert.objects.create(
-            user=user,
+    elif level == LEVEL_WARNING:
+        percentage = spent / budget.amount * 100
+        return BudgetAlert(
+            user_id=budget.user_id,
             budget=budget,
             alert_type='warning',
             message=f"You have used {percentage:.0f}% of your {budget.period} budget{category_text}. Spent ${spent:.2f} of ${budget.amount:.2f}",
             current_spent=spent
         )
     
-    return alert
+    return None
 
 
 @api_view(['GET', 'POST'])
@@ -99,15 +177,11 @@ def check_budget_alerts(user, budget):
 def budget_list(request):
     """List all budgets or create a new one"""
     if request.method == 'GET':
-        budgets = Budget.objects.filter(user=request.user)
+        budgets = list(Budget.objects.filter(user=request.user))
         
         # Include current spending info
-        budget_data = []
-        for budget in budgets:
-            data = budget.to_dict()
-            data['current_spent'] = float(calculate_spent(request.user, budget.period, budget.category))
-            data['percentage'] = (data['current_spent'] / float(budget.amount) * 100) if budget.amount > 0 else 0
-            budget_data.append(data)
+        spent = calculate_spent_many(request.user, budgets)
+        budget_data = [budget_with_spending(budget, spent[budget.id]) for budget in budgets]
         
         return Response(budget_data)
     
@@ -129,33 +203,18 @@ def budget_list(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if budget already exists
-        existing = Budget.objects.filter(
-            user=request.user,
-            period=period,
-            category=category
-        ).first()
-        
-        if existing:
-            # Update existing budget
-            existing.amount = Decimal(str(amount))
-            existing.alert_threshold = alert_threshold
-            existing.is_active = True
-            existing.save()
-            budget = existing
-        else:
-            # Create new budget
-            budget = Budget.objects.create(
-                user=request.user,
-                period=period,
-                amount=Decimal(str(amount)),
-                category=category,
-                alert_threshold=alert_threshold
-            )
+        # Create the budget, or update the existing one for this period and category
+        budget = upsert_budget(
+            request.user.id,
+            period,
+            Decimal(str(amount)),
+            category or None,
+            alert_threshold
+        )
+        bump_data_version(request.user.id)
         
-        data = budget.to_dict()
-        data['current_spent'] = float(calculate_spent(request.user, budget.period, budget.category))
-        data['percentage'] = (data['current_spent'] / float(budget.amount) * 100) if budget.amount > 0 else 0
+        spent = calculate_spent_many(request.user, [budget])
+        data = budget_with_spending(budget, spent[budget.id])
         
         return Response(data, status=status.HTTP_201_CREATED)
 
@@ -173,9 +232,8 @@ def budget_detail(request, budget_id):
         )
     
     if request.method == 'GET':
-        data = budget.to_dict()
-        data['current_spent'] = float(calculate_spent(request.user, budget.period, budget.category))
-        data['percentage'] = (data['current_spent'] / float(budget.amount) * 100) if budget.amount > 0 else 0
+        spent = calculate_spent_many(request.user, [budget])
+        data = budget_with_spending(budget, spent[budget.id])
         return Response(data)
     
     elif request.method == 'PUT':
@@ -188,9 +246,8 @@ def budget_detail(request, budget_id):
         
         budget.save()
         
-        data = budget.to_dict()
-        data['current_spent'] = float(calculate_spent(request.user, budget.period, budget.category))
-        data['percentage'] = (data['current_spent'] / float(budget.amount) * 100) if budget.amount > 0 else 0
+        spent = calculate_spent_many(request.user, [budget])
+        data = budget_with_spending(budget, spent[budget.id])
         return Response(data)
     
     elif request.method == 'DELETE':
@@ -226,15 +283,20 @@ def mark_alert_read(request, alert_id):
 @permission_classes([IsAuthenticated])
 def mark_all_alerts_read(request):
     """Mark all budget alerts as read"""
-    BudgetAlert.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    updated = BudgetAlert.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    if updated:
+        bump_data_version(request.user.id)
     return Response({'message': 'All alerts marked as read'})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_on_data_version
 def budget_summary(request):
     """Get budget summary with spending status"""
-    budgets = Budget.objects.filter(user=request.user, is_active=True)
+    # Overall budgets only
+    budgets = list(Budget.objects.filter(user=request.user, is_active=True, category__isnull=True))
+    spent_by_budget = calculate_spent_many(request.user, budgets)
     
     summary = {
         'daily': None,
@@ -243,18 +305,17 @@ def budget_summary(request):
     }
     
     for budget in budgets:
-        if budget.category is None:  # Overall budget
-            spent = calculate_spent(request.user, budget.period)
-            percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
-            
-            summary[budget.period] = {
-                'budget': float(budget.amount),
-                'spent': float(spent),
-                'remaining': float(budget.amount - spent),
-                'percentage': float(percentage),
-                'alert_threshold': budget.alert_threshold,
-                'status': 'exceeded' if percentage >= 100 else ('warning' if percentage >= budget.alert_threshold else 'ok')
-            }
+        spent = spent_by_budget[budget.id]
+        percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
+        
+        summary[budget.period] = {
+            'budget': float(budget.amount),
+            'spent': float(spent),
+            'remaining': float(budget.amount - spent),
+            'percentage': float(percentage),
+            'alert_threshold': budget.alert_threshold,
+            'status': 'exceeded' if percentage >= 100 else ('warning' if percentage >= budget.alert_threshold else 'ok')
+        }
     
     # Get unread alerts count
     unread_alerts = BudgetAlert.objects.filter(user=request.user, is_read=False).count()
@@ -7,7 +7,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.db import transaction
 
+from .budget_state import reset_period_states
 from .models import UserCategory
+from .versioning import bump_data_version, etag_on_data_version
 
 
 # Default system categories
@@ -32,6 +34,7 @@ DEFAULT_CATEGORIES = [
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_on_data_version
 def category_list(request):
     """List all categories (default + user's custom categories)"""
     # Get user's custom categories
@@ -151,10 +154,16 @@ def custom_category_detail(request, category_id):
         if migrate_to:
             # Migrate receipts to another category
             from apps.receipts.models import Receipt
-            Receipt.objects.filter(
-                user=request.user,
-                category=category.name
-            ).update(category=migrate_to)
+            from apps.receipts import rollups
+            with transaction.atomic():
+                migrated = Receipt.objects.filter(
+                    user=request.user,
+                    category=category.name
+                ).update(category=migrate_to)
+                if migrated:
+                    rollups.move_category(request.user.id, category.name, migrate_to)
+                    reset_period_states(request.user.id, categories=[category.name, migrate_to])
+                    bump_data_version(request.user.id)
         
         category.delete()
         return Response({'message': 'Category deleted successfully'})
@@ -180,11 +189,18 @@ def migrate_category_receipts(request, category_id):
         )
     
     from apps.receipts.models import Receipt
+    from apps.receipts import rollups
     
-    count = Receipt.objects.filter(
-        user=request.user,
-        category=category.name
-    ).update(category=migrate_to)
+    with transaction.atomic():
+        count = Receipt.objects.filter(
+            user=request.user,
+            category=category.name
+        ).update(category=migrate_to)
+        
+        if count:
+            rollups.move_category(request.user.id, category.name, migrate_to)
+            reset_period_states(request.user.id, categories=[category.name, migrate_to])
+            bump_data_version(request.user.id)
     
     return Response({
         'message': f'Migrated {count} receipts from "{category.name}" to "{migrate_to}"',
@@ -0,0 +1,17 @@
+"""
+Password hashers with cost parameters taken from settings
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id sized for this deployment.
+
+    The algorithm name is unchanged, so existing argon2 hashes still verify
+    and are rehashed on login whenever these parameters change.
+    """
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST  # KiB
+    parallelism = settings.ARGON2_PARALLELISM
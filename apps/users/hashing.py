@@ -0,0 +1,88 @@
+"""
+Password hashing off the request thread
+
+Hashing and verifying passwords is deliberately slow. Both run on a
+bounded pool shared by the worker process's request threads (hashlib's
+PBKDF2 and argon2-cffi release the GIL, so threads run them in parallel).
+The request thread still waits for its hash, but when
+PASSWORD_HASH_MAX_PENDING hashes are already waiting it fails fast with
+503, so a burst of logins cannot occupy every thread of a gthread worker.
+Under sync workers there is one request per process and this never
+triggers. Latencies are reported through /api/metrics.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from fint_backend.metrics import increment, observe
+from fint_backend.pools import get_pool
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please try again shortly'
+    default_code = 'hashing_busy'
+    wait = 1  # Sent as Retry-After
+
+
+def hashing_pool():
+    return get_pool(
+        'password-hashing',
+        settings.PASSWORD_HASH_WORKERS,
+        settings.PASSWORD_HASH_MAX_PENDING,
+    )
+
+
+def _timed(kind, fn, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        observe(f'password_{kind}_ms', (time.perf_counter() - started) * 1000)
+
+
+def _run(kind, fn, *args):
+    """fn(*args) on the hashing pool; raises HashingBusy when the pool is full"""
+    started = time.perf_counter()
+    future = hashing_pool().submit_future(_timed, kind, fn, *args)
+    if future is None:
+        increment('password_hash_rejected')
+        raise HashingBusy()
+    try:
+        return future.result()
+    finally:
+        # Including time spent queued behind other hashes
+        observe(f'password_{kind}_total_ms', (time.perf_counter() - started) * 1000)
+
+
+def make_password(raw_password):
+    """Hash a password with the preferred hasher"""
+    return _run('hash', hashers.make_password, raw_password)
+
+
+def set_password(user, raw_password):
+    """user.set_password() with the hashing done on the pool; the caller saves"""
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
+
+def check_password(user, raw_password):
+    """
+    user.check_password() with the verification done on the pool.
+
+    A correct password stored with an outdated hasher or cost is rehashed
+    with the preferred one and saved, unless the pool is too busy to do it
+    right now; the next login will try again.
+    """
+    is_correct, must_update = _run('verify', hashers.verify_password, raw_password, user.password)
+    if is_correct and must_update:
+        try:
+            user.password = make_password(raw_password)
+        except HashingBusy:
+            return is_correct
+        user.save(update_fields=['password'])
+        increment('password_rehashed')
+    return is_correct
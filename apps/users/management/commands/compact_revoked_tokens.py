@@ -0,0 +1,23 @@
+"""
+Delete revoked-token records for tokens that have expired anyway
+"""
+from django.core.management.base import BaseCommand
+
+from apps.users.revocation import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete revocations of expired tokens in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        removed = 0
+        while True:
+            count = compact(options['batch_size'])
+            if not count:
+                break
+            removed += count
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired token revocations'))
@@ -0,0 +1,23 @@
+"""
+Delete password reset tokens that have expired
+"""
+from django.core.management.base import BaseCommand
+
+from apps.users.reset_tokens import purge
+
+
+class Command(BaseCommand):
+    help = 'Delete expired password reset tokens in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        removed = 0
+        while True:
+            count = purge(options['batch_size'])
+            if not count:
+                break
+            removed += count
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired password reset tokens'))
@@ -0,0 +1,59 @@
+"""
+Budget alert worker
+"""
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.users.alert_jobs import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Evaluate queued budget alert jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.ALERT_WORKER_CONCURRENCY)
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Drain due jobs and exit')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.work, args=(options,), name=f'alert-worker-{i}', daemon=True)
+            for i in range(max(1, options['concurrency']))
+        ]
+        self.stdout.write(f'Alert worker started with {len(threads)} thread(s)')
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write('Alert worker stopped')
+
+    def work(self, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                jobs = claim_jobs(options['batch_size'])
+                for user_id, generation in jobs:
+                    try:
+                        alerts = run_job(user_id, generation)
+                    except Exception as e:
+                        self.stderr.write(f'Alert job for user {user_id} failed: {e}')
+                        continue
+                    if alerts:
+                        self.stdout.write(f'User {user_id}: {len(alerts)} alert(s) raised')
+                if not jobs:
+                    if options['once']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+        finally:
+            connection.close()
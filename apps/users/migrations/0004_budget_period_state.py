@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetPeriodState',
+            fields=[
+                ('budget', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='period_state', serialize=False, to='users.budget')),
+                ('period_start', models.DateField()),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('alerted_level', models.SmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'budget_period_states',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_budget_period_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertJob',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='alert_job', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('generation', models.BigIntegerField(default=1)),
+                ('run_after', models.DateTimeField(db_index=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'budget_alert_jobs',
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:56
+
+import apps.users.models
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def dedupe_for_constraints(apps, schema_editor):
+    """
+    Backfill alert_date and drop rows the new unique constraints would reject.
+
+    This deletes user data: of budgets sharing (user, period, category) only
+    the most recently updated is kept, the others' alerts going with them,
+    and of a budget's alerts on the same day only the latest is kept.
+    """
+    Budget = apps.get_model('users', 'Budget')
+    BudgetAlert = apps.get_model('users', 'BudgetAlert')
+    
+    seen = set()
+    for budget in Budget.objects.order_by('-updated_at', '-id').iterator():
+        key = (budget.user_id, budget.period, budget.category or '')
+        if key in seen:
+            budget.delete()
+        else:
+            seen.add(key)
+    
+    seen = set()
+    for alert in BudgetAlert.objects.order_by('-created_at', '-id').iterator():
+        alert_date = alert.created_at.date()
+        if (alert.budget_id, alert_date) in seen:
+            alert.delete()
+            continue
+        seen.add((alert.budget_id, alert_date))
+        if alert.alert_date != alert_date:
+            alert.alert_date = alert_date
+            alert.save(update_fields=['alert_date'])
+
+
+class Migration(migrations.Migration):
+    # The dedupe commits on its own before the constraints are added: on
+    # PostgreSQL, DDL in the same transaction as the cascading deletes can
+    # fail with "pending trigger events"
+    atomic = False
+
+    dependencies = [
+        ('users', '0005_alert_job'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='budget',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='budgetalert',
+            name='alert_date',
+            field=models.DateField(default=apps.users.models.today),
+        ),
+        migrations.RunPython(dedupe_for_constraints, migrations.RunPython.noop, atomic=True),
+        migrations.AddConstraint(
+            model_name='budget',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('period'), django.db.models.functions.comparison.Coalesce('category', models.Value('')), name='budgets_user_period_category_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='budgetalert',
+            constraint=models.UniqueConstraint(fields=('budget', 'alert_date'), name='budget_alerts_budget_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:39
+
+import hashlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_reset_tokens(apps, schema_editor):
+    # Outstanding links keep working; only their digests are kept
+    User = apps.get_model('users', 'User')
+    PasswordResetToken = apps.get_model('users', 'PasswordResetToken')
+    PasswordResetToken.objects.bulk_create(
+        [
+            PasswordResetToken(
+                user_id=user_id,
+                token_hash=hashlib.sha256(token.encode()).hexdigest(),
+                expires_at=expires,
+            )
+            for user_id, token, expires in User.objects.filter(
+                reset_token__isnull=False, reset_token_expires__isnull=False
+            ).values_list('id', 'reset_token', 'reset_token_expires').iterator()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_revoked_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PasswordResetToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_hash', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='password_reset_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'password_reset_tokens',
+            },
+        ),
+        migrations.RunPython(move_reset_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='reset_token',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='reset_token_expires',
+        ),
+    ]
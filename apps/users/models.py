@@ -3,9 +3,18 @@ Custom User model
 """
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from decimal import Decimal
 
+from . import hashing
+
+
+def today():
+    """Current UTC date, matching budget period boundaries"""
+    return timezone.now().date()
+
 
 class UserManager(BaseUserManager):
     """Custom user manager"""
@@ -17,7 +26,11 @@ class UserManager(BaseUserManager):
         
         email = self.normalize_email(email)
         user = self.model(email=email, name=name, **extra_fields)
-        user.set_password(password)
+        if password is None:
+            user.set_unusable_password()
+        else:
+            # Hashed on the bounded pool; raises HashingBusy when it is full
+            hashing.set_password(user, password)
         user.save(using=self._db)
         return user
     
@@ -38,10 +51,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
-    
-    # Password reset token
-    reset_token = models.CharField(max_length=255, blank=True, null=True)
-    reset_token_expires = models.DateTimeField(blank=True, null=True)
+    # Embedded in issued JWTs as `tv`; bumping it invalidates every earlier token
+    token_version = models.PositiveIntegerField(default=0)
     
     objects = UserManager()
     
@@ -65,6 +76,45 @@ class User(AbstractBaseUser, PermissionsMixin):
         }
 
 
+class RevokedToken(models.Model):
+    """A JWT revoked before its expiry, e.g. by logging out; kept until it would have expired"""
+    
+    jti = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE,
+        related_name='revoked_tokens'
+    )
+    expires_at = models.DateTimeField(db_index=True)
+    # Workers poll for recent revocations by this column
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        db_table = 'revoked_tokens'
+    
+    def __str__(self):
+        return f"{self.jti} (user {self.user_id}, until {self.expires_at})"
+
+
+class PasswordResetToken(models.Model):
+    """An outstanding password reset link; only the SHA-256 digest of its token is stored"""
+    
+    user = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE,
+        related_name='password_reset_tokens'
+    )
+    token_hash = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'password_reset_tokens'
+    
+    def __str__(self):
+        return f"Reset token for user {self.user_id} (until {self.expires_at})"
+
+
 class Budget(models.Model):
     """Budget model for spending limits"""
     
@@ -89,7 +139,15 @@ class Budget(models.Model):
     
     class Meta:
         db_table = 'budgets'
-        unique_together = ['user', 'period', 'category']
+        constraints = [
+            # NULL (all categories) must collide with NULL, so index COALESCE(category, '')
+            models.UniqueConstraint(
+                'user',
+                'period',
+                Coalesce('category', Value('')),
+                name='budgets_user_period_category_uniq',
+            ),
+        ]
     
     def __str__(self):
         cat = self.category or 'All'
@@ -130,11 +188,15 @@ class BudgetAlert(models.Model):
     message = models.TextField()
     current_spent = models.DecimalField(max_digits=10, decimal_places=2)
     is_read = models.BooleanField(default=False)
+    alert_date = models.DateField(default=today)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'budget_alerts'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'alert_date'], name='budget_alerts_budget_day_uniq'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.alert_type}: {self.message[:50]}"
@@ -151,6 +213,50 @@ class BudgetAlert(models.Model):
         }
 
 
+class BudgetPeriodState(models.Model):
+    """Running spend for a budget's current period, updated on every receipt write"""
+    
+    budget = models.OneToOneField(
+        Budget,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='period_state'
+    )
+    period_start = models.DateField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    alerted_level = models.SmallIntegerField(default=0)  # Highest alert level raised this period
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'budget_period_states'
+    
+    def __str__(self):
+        return f"Budget {self.budget_id} from {self.period_start}: ${self.spent}"
+
+
+class AlertJob(models.Model):
+    """Queued budget alert evaluation; one row per user coalesces bursts of receipt writes"""
+    
+    user = models.OneToOneField(
+        'User',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='alert_job'
+    )
+    generation = models.BigIntegerField(default=1)  # Bumped by every request folded into this job
+    run_after = models.DateTimeField(db_index=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'budget_alert_jobs'
+    
+    def __str__(self):
+        return f"Alert job for user {self.user_id} (generation {self.generation})"
+
+
 class UserCategory(models.Model):
     """Custom categories created by users"""
     
@@ -180,3 +286,21 @@ class UserCategory(models.Model):
             'is_custom': True,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class UserDataVersion(models.Model):
+    """Per-user counter bumped on every write to the user's receipts, budgets, alerts or categories"""
+    
+    user = models.OneToOneField(
+        'User',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version'
+    )
+    version = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'user_data_versions'
+    
+    def __str__(self):
+        return f"{self.user_id} - v{self.version}"
@@ -1,10 +1,13 @@
 """
 User profile views
 """
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from . import auth_cache, hashing
+from .authentication import generate_token
 from .models import User
 from .serializers import PasswordChangeSerializer, ProfileUpdateSerializer
 
@@ -26,7 +29,7 @@ def update_profile(request):
     if 'avatar_url' in data:
         user.avatar_url = data['avatar_url'] if data['avatar_url'] else None
     
-    user.save()
+    user.save(update_fields=['name', 'avatar_url', 'updated_at'])
     
     return Response({'user': user.to_dict()})
 
@@ -44,21 +47,31 @@ def change_password(request):
     data = serializer.validated_data
     user = request.user
     
-    if not user.check_password(data['currentPassword']):
+    if not hashing.check_password(user, data['currentPassword']):
         return Response({'error': 'Current password is incorrect'}, status=status.HTTP_401_UNAUTHORIZED)
     
-    user.set_password(data['newPassword'])
-    user.save()
+    # Sign out every other session; the caller continues with the new token
+    hashing.set_password(user, data['newPassword'])
+    with transaction.atomic():
+        user.save(update_fields=['password', 'updated_at'])
+        auth_cache.bump_token_version(user)
     
-    return Response({'message': 'Password changed successfully'})
+    return Response({'message': 'Password changed successfully', 'token': generate_token(user)})
 
 
 @api_view(['DELETE'])
 def delete_account(request):
     """Delete user account and all data"""
+    from apps.receipts.blobstore import release_user
+    from apps.receipts.export_jobs import delete_user_exports
+    
     user = request.user
+    delete_user_exports(user.id)
     
-    # Delete all user's receipts (cascade should handle this)
-    user.delete()
+    # Delete all user's receipts (cascade should handle this); their
+    # images are left to the blob garbage collector
+    with transaction.atomic():
+        release_user(user.id)
+        user.delete()
     
     return Response({'message': 'Account deleted successfully'})
@@ -0,0 +1,67 @@
+"""
+Password reset tokens
+
+The emailed token is random; the password_reset_tokens table only holds
+its SHA-256 digest, so a reset is a unique-index probe and a leaked table
+cannot be used to reset passwords. Issuing a token replaces the user's
+earlier ones, and redeeming one deletes them all. Expired rows are
+removed with `manage.py purge_password_reset_tokens`.
+"""
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PasswordResetToken
+
+
+def digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue(user):
+    """Create a reset token for user and return it; earlier tokens stop working"""
+    token = secrets.token_urlsafe(32)
+    with transaction.atomic():
+        PasswordResetToken.objects.filter(user=user).delete()
+        PasswordResetToken.objects.create(
+            user=user,
+            token_hash=digest(token),
+            expires_at=timezone.now() + settings.PASSWORD_RESET_TOKEN_LIFETIME,
+        )
+    return token
+
+
+def redeem(token):
+    """
+    The user a token was issued to, deleting the user's reset tokens; None if
+    the token is unknown, expired or was redeemed concurrently. Call inside
+    the transaction that changes the password.
+    """
+    reset = (
+        PasswordResetToken.objects
+        .select_related('user')
+        .filter(token_hash=digest(token), expires_at__gt=timezone.now())
+        .first()
+    )
+    if reset is None:
+        return None
+    # Only one of two concurrent requests deletes the row
+    deleted, _ = PasswordResetToken.objects.filter(pk=reset.pk).delete()
+    if not deleted:
+        return None
+    PasswordResetToken.objects.filter(user_id=reset.user_id).delete()
+    return reset.user
+
+
+def purge(limit=None):
+    """Delete expired reset tokens; returns how many were removed"""
+    expired = PasswordResetToken.objects.filter(expires_at__lte=timezone.now())
+    if limit is not None:
+        expired = PasswordResetToken.objects.filter(
+            id__in=list(expired.order_by('expires_at').values_list('id', flat=True)[:limit])
+        )
+    deleted, _ = expired.delete()
+    return deleted
@@ -0,0 +1,150 @@
+"""
+Revoked JWT tracking
+
+Revoked token ids (jti) live in the revoked_tokens table until the token
+would have expired anyway. Each worker mirrors the unexpired ones in a
+Bloom filter: a token not in the filter is certainly not revoked and
+needs no I/O, and only filter hits are confirmed with an exact lookup.
+
+The filter is topped up every REVOCATION_REFRESH_SECONDS with rows
+revoked since the last refresh (re-reading REVOCATION_REFRESH_OVERLAP_SECONDS
+so rows from transactions that committed late are not missed), and
+rebuilt every REVOCATION_REBUILD_SECONDS to drop expired entries.
+Expired rows are left for the compact_revoked_tokens command to delete in
+batches, keeping bulk writes out of the authentication path.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from fint_backend.metrics import increment
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about error_rate false positives at capacity"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        """Add key; count tracks keys that were not (apparently) present already"""
+        if key in self:
+            return
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def compact(limit=None):
+    """Delete revocations of tokens that have expired; returns how many were removed"""
+    expired = RevokedToken.objects.filter(expires_at__lte=timezone.now())
+    if limit is not None:
+        expired = RevokedToken.objects.filter(
+            id__in=list(expired.order_by('expires_at').values_list('id', flat=True)[:limit])
+        )
+    deleted, _ = expired.delete()
+    return deleted
+
+
+class RevocationSet:
+    """This worker's view of revoked token ids"""
+
+    def __init__(self):
+        self._filter = None
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._since = None
+
+    def _rebuild(self):
+        now = timezone.now()
+        jtis = list(RevokedToken.objects.filter(expires_at__gt=now).values_list('jti', flat=True))
+        bloom = BloomFilter(
+            max(settings.REVOCATION_BLOOM_CAPACITY, 2 * len(jtis)),
+            settings.REVOCATION_BLOOM_ERROR_RATE,
+        )
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter = bloom
+        self._since = now
+        self._rebuilt_at = self._refreshed_at = time.monotonic()
+        increment('token_revocation_rebuilds')
+
+    def _top_up(self):
+        now = timezone.now()
+        since = self._since - timedelta(seconds=settings.REVOCATION_REFRESH_OVERLAP_SECONDS)
+        for jti in RevokedToken.objects.filter(revoked_at__gte=since).values_list('jti', flat=True):
+            self._filter.add(jti)
+        self._since = now
+        self._refreshed_at = time.monotonic()
+        if self._filter.count > self._filter.capacity:
+            self._rebuild()
+
+    def refresh(self):
+        """Bring the filter up to date if it is due; only one thread per worker does the work"""
+        now = time.monotonic()
+        if self._filter is not None and now - self._refreshed_at < settings.REVOCATION_REFRESH_SECONDS:
+            return
+        # Until the first load every request has to wait for it
+        if not self._lock.acquire(blocking=self._filter is None):
+            return
+        try:
+            if self._filter is None or now - self._rebuilt_at >= settings.REVOCATION_REBUILD_SECONDS:
+                self._rebuild()
+            elif now - self._refreshed_at >= settings.REVOCATION_REFRESH_SECONDS:
+                self._top_up()
+        finally:
+            self._lock.release()
+
+    def is_revoked(self, jti):
+        self.refresh()
+        if jti not in self._filter:
+            return False
+        increment('token_revocation_filter_hits')
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        if not revoked:
+            increment('token_revocation_false_positives')
+        return revoked
+
+    def add(self, jti):
+        if self._filter is not None:
+            self._filter.add(jti)
+
+
+_revoked = RevocationSet()
+
+
+def is_revoked(jti):
+    """Whether the token with this jti has been revoked"""
+    return _revoked.is_revoked(jti)
+
+
+def revoke(user_id, jti, expires_at):
+    """Revoke one token until expires_at; takes effect in this worker at commit, others within a refresh"""
+    RevokedToken.objects.bulk_create(
+        [RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at)],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(lambda: _revoked.add(jti))
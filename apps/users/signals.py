@@ -0,0 +1,35 @@
+"""
+Signal receivers that keep per-user data versions and cached auth state current
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.receipts.models import Receipt
+from .auth_cache import invalidate
+from .models import Budget, BudgetAlert, User, UserCategory
+from .versioning import bump_data_version
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=BudgetAlert)
+@receiver(post_save, sender=UserCategory)
+def bump_on_save(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Receipt)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=BudgetAlert)
+@receiver(post_delete, sender=UserCategory)
+def bump_on_delete(sender, instance, origin=None, **kwargs):
+    # Rows removed by deleting the account have no version left to bump
+    if isinstance(origin, User):
+        return
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_cache(sender, instance, **kwargs):
+    invalidate(instance.id)
@@ -7,6 +7,7 @@ from . import views
 urlpatterns = [
     path('register', views.register, name='register'),
     path('login', views.login, name='login'),
+    path('logout', views.logout, name='logout'),
     path('me', views.get_current_user, name='current_user'),
     path('forgot-password', views.request_password_reset, name='forgot_password'),
     path('reset-password', views.reset_password, name='reset_password'),
@@ -0,0 +1,117 @@
+"""
+Per-user data versions and ETag handling for polled read endpoints
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import UserDataVersion
+
+
+def _cache():
+    """Shared cache for versions, or None to read them from the database"""
+    alias = settings.DATA_VERSION_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _cache_key(user_id):
+    return f'data_version:{user_id}'
+
+
+def get_data_version(user_id):
+    """Current data version for a user: one primary key lookup, or none on a cache hit"""
+    cache = _cache()
+    if cache is not None:
+        version = cache.get(_cache_key(user_id))
+        if version is not None:
+            return version
+
+    version = UserDataVersion.objects.filter(user_id=user_id).values_list(
+        'version', flat=True
+    ).first() or 0
+
+    if cache is not None:
+        # add() never overwrites a bump's newer value; the TTL bounds how long
+        # a version read just before a concurrent bump can outlive it
+        cache.add(_cache_key(user_id), version, settings.DATA_VERSION_CACHE_TTL_SECONDS)
+    return version
+
+
+def _increment(user_id):
+    _, created = UserDataVersion.objects.get_or_create(user_id=user_id, defaults={'version': 1})
+    if not created:
+        UserDataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+    cache = _cache()
+    if cache is not None:
+        # Store the new version rather than deleting the key, which let a
+        # reader that had fetched the old one add it back afterwards
+        version = UserDataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).get()
+        cache.set(_cache_key(user_id), version, settings.DATA_VERSION_CACHE_TTL_SECONDS)
+
+
+def bump_data_version(user_id):
+    """
+    Mark a user's data as changed.
+
+    The bump runs after the surrounding transaction commits, so a reader can
+    never pair the new version with data it cannot see yet.
+    """
+    transaction.on_commit(lambda: _increment(user_id))
+
+
+def data_version_etag(request, version):
+    """Weak ETag covering the data version, the request path and its query params"""
+    params = '&'.join(
+        f'{key}={value}'
+        for key in sorted(request.query_params)
+        for value in request.query_params.getlist(key)
+    )
+    # Period-based figures (this month, this week) change at day boundaries
+    # without any write, so the current date is part of the validator.
+    digest = hashlib.sha1(
+        f'{request.path}?{params}|{timezone.now().date().isoformat()}'.encode()
+    ).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def _matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    bare = etag[2:]
+    return any(tag.removeprefix('W/') == bare for tag in parse_etags(if_none_match))
+
+
+def etag_on_data_version(view):
+    """Answer conditional GETs with 304 before the view runs any queries"""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        etag = data_version_etag(request, get_data_version(request.user.id))
+        if_none_match = request.headers.get('If-None-Match')
+
+        if if_none_match and _matches(if_none_match, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        response.setdefault('Cache-Control', 'private, no-cache')
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    return wrapped
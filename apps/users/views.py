@@ -1,10 +1,10 @@
 """
 Authentication views
 """
-import secrets
-from datetime import datetime, timedelta
+from datetime import datetime, timezone as dt_timezone
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from rest_framework import status
@@ -12,6 +12,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from . import auth_cache, hashing, reset_tokens
 from .models import User
 from .serializers import (
     RegisterSerializer, 
@@ -20,6 +21,7 @@ from .serializers import (
     PasswordResetSerializer
 )
 from .authentication import generate_token
+from .revocation import revoke
 
 
 @api_view(['POST'])
@@ -68,7 +70,7 @@ def login(request):
     except User.DoesNotExist:
         return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
     
-    if not user.check_password(data['password']):
+    if not hashing.check_password(user, data['password']):
         return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
     
     if not user.is_active:
@@ -84,6 +86,21 @@ def login(request):
     })
 
 
+@api_view(['POST'])
+def logout(request):
+    """Revoke the token used for this request, or every token of the user with {"all": true}"""
+    user = request.user
+    
+    if request.data.get('all'):
+        auth_cache.bump_token_version(user)
+    else:
+        payload = request.auth
+        if payload.get('jti'):
+            revoke(user.id, payload['jti'], datetime.fromtimestamp(payload['exp'], dt_timezone.utc))
+    
+    return Response({'message': 'Logged out successfully'})
+
+
 @api_view(['GET'])
 def get_current_user(request):
     """Get current user info"""
@@ -109,11 +126,7 @@ def request_password_reset(request):
         # Don't reveal if email exists
         return Response({'message': 'If the email exists, a reset link has been sent'})
     
-    # Generate reset token
-    token = secrets.token_urlsafe(32)
-    user.reset_token = token
-    user.reset_token_expires = datetime.utcnow() + timedelta(hours=1)
-    user.save()
+    token = reset_tokens.issue(user)
     
     # Send email
     reset_url = f"{settings.FRONTEND_URL}/reset-password?token={token}"
@@ -151,19 +164,14 @@ def reset_password(request):
     
     data = serializer.validated_data
     
-    try:
-        user = User.objects.get(reset_token=data['token'])
-    except User.DoesNotExist:
-        return Response({'error': 'Invalid or expired reset token'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Check if token is expired
-    if user.reset_token_expires and user.reset_token_expires < datetime.utcnow():
-        return Response({'error': 'Reset token has expired'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Update password
-    user.set_password(data['password'])
-    user.reset_token = None
-    user.reset_token_expires = None
-    user.save()
+    # If hashing fails (e.g. the pool is busy) the rollback keeps the token usable
+    with transaction.atomic():
+        user = reset_tokens.redeem(data['token'])
+        if user is None:
+            return Response({'error': 'Invalid or expired reset token'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        hashing.set_password(user, data['password'])
+        user.save(update_fields=['password', 'updated_at'])
+        auth_cache.bump_token_version(user)  # Existing sessions end with the old password
     
     return Response({'message': 'Password reset successfully'})
@@ -0,0 +1,57 @@
+"""
+In-process metrics
+
+Counters and latency samples are kept per worker process and read through
+/api/metrics when METRICS_ENABLED is set; scrape each worker (or sum
+across them) for totals. Percentiles cover each metric's most recent
+SAMPLE_SIZE observations.
+"""
+import os
+import threading
+from collections import deque
+
+
+SAMPLE_SIZE = 1024
+
+_lock = threading.Lock()
+_counters = {}
+_samples = {}
+
+
+def increment(name, value=1):
+    """Add value to a named counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, value):
+    """Record one measurement, such as a latency in milliseconds"""
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            samples = _samples[name] = deque(maxlen=SAMPLE_SIZE)
+        samples.append(value)
+
+
+def _summary(values):
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        'samples': len(ordered),
+        'p50': ordered[last * 50 // 100],
+        'p90': ordered[last * 90 // 100],
+        'p99': ordered[last * 99 // 100],
+        'max': ordered[last],
+    }
+
+
+def snapshot():
+    """Current values of every metric in this process"""
+    with _lock:
+        counters = dict(_counters)
+        samples = {name: list(values) for name, values in _samples.items()}
+    return {
+        'pid': os.getpid(),
+        'counters': counters,
+        'summaries': {name: _summary(values) for name, values in samples.items()},
+    }
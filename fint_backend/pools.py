@@ -0,0 +1,133 @@
+"""
+Bounded background executors
+
+Work that should not hold up a request (image processing and the like)
+is handed to a small per-process pool. Each pool accepts a fixed number of
+tasks; when it is full, submit() returns False (or None) instead of
+queueing without limit, and the caller falls back to whatever catch-up
+path it has.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.db import connection
+
+
+class BoundedExecutor:
+    """Thread pool with at most max_workers running and max_pending waiting tasks"""
+
+    def __init__(self, name, max_workers, max_pending):
+        self.name = name
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use, so forked server workers each start their own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); returns False when the pool is full"""
+        if not self._slots.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                print(f"{self.name} task failed: {e}")
+            finally:
+                # Pool threads are long-lived; don't keep a connection per thread open
+                connection.close()
+                self._slots.release()
+
+        try:
+            self._get_executor().submit(run)
+        except RuntimeError:
+            self._slots.release()
+            return False
+        return True
+
+    def submit_future(self, fn, *args):
+        """Queue fn(*args) and return its Future, or None when the pool is full; fn must not use the database"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except RuntimeError:
+            self._slots.release()
+            return None
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+class BoundedProcessPool:
+    """
+    Process pool for CPU-bound work that would otherwise hold the GIL.
+
+    Tasks must be picklable module-level functions that do not touch the
+    database. Children are started by a fork server, so they never inherit
+    a web worker's threads or connections.
+    """
+
+    def __init__(self, name, max_workers, max_pending):
+        self.name = name
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('forkserver'),
+                )
+            return self._executor
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) and return its Future, or None when the pool is full"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            # A crashed child breaks the executor; start a fresh one next time
+            self.shutdown(wait=False)
+            return None
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, max_workers, max_pending, processes=False):
+    """The pool registered under name, created on first use"""
+    with _pools_lock:
+        if name not in _pools:
+            pool_class = BoundedProcessPool if processes else BoundedExecutor
+            _pools[name] = pool_class(name, max_workers, max_pending)
+        return _pools[name]
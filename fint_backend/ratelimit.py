@@ -0,0 +1,186 @@
+"""
+Rate limiting for expensive endpoints
+
+RATE_LIMITS maps URL names to the buckets a request must take a token
+from, for example:
+
+    'login': [{'key': 'ip', 'rate': '10/m', 'burst': 5}],
+    'export_receipts': [{'key': 'user', 'rate': '6/m', 'methods': ['GET']}],
+
+`rate` is the refill rate ('<n>/s', '/m', '/h' or '/d'), `burst` the
+bucket size (defaults to n), `key` either 'ip' or 'user' (the JWT's user,
+or the IP when the request carries no valid token), and `methods` limits
+the policy to those HTTP methods. A request over any of its limits gets
+429 with Retry-After.
+
+RATE_LIMIT_BACKEND picks where buckets live: 'local' keeps token buckets
+in each worker process (limits are then per worker); 'cache' counts in a
+fixed window in a Django cache shared by all workers, using atomic
+add()/incr() so it suits Redis or Memcached.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from .metrics import increment
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+class Policy:
+    def __init__(self, name, index, key='ip', rate='60/m', burst=None, methods=None):
+        if key not in ('ip', 'user'):
+            raise ValueError(f"Rate limit key for {name} must be 'ip' or 'user', not {key!r}")
+        count, period = parse_rate(rate)
+        self.prefix = f'{name}:{index}'
+        self.key = key
+        self.rate = count / period  # Tokens per second
+        self.burst = burst or count
+        self.methods = frozenset(m.upper() for m in methods) if methods else None
+
+
+class LocalBackend:
+    """Token buckets in this process's memory, evicting the least recently used past max_keys"""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        """Take a token; returns 0 when allowed, else seconds until one is available"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+
+            # Clients cycling through keys only push out idle buckets, never active ones
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class CacheBackend:
+    """Fixed-window counters in a shared Django cache; a window allows `burst` requests"""
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, rate, burst, now):
+        window = burst / rate
+        index = int(now // window)
+        cache_key = f'ratelimit:{key}:{index}'
+        timeout = math.ceil(window) + 1
+
+        self.cache.add(cache_key, 0, timeout)
+        try:
+            count = self.cache.incr(cache_key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(cache_key, 1, timeout)
+            count = 1
+        if count <= burst:
+            return 0
+        return (index + 1) * window - now
+
+
+def client_ip(request):
+    """
+    The client's address. Behind RATE_LIMIT_TRUSTED_PROXIES proxies that
+    each append to RATE_LIMIT_IP_HEADER (X-Forwarded-For style), it is the
+    entry added by the outermost trusted proxy; entries left of it come
+    from the client and can be forged.
+    """
+    header = settings.RATE_LIMIT_IP_HEADER
+    hops = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if header and hops and request.META.get(header):
+        entries = [entry.strip() for entry in request.META[header].split(',')]
+        return entries[max(0, len(entries) - hops)]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def user_key(request):
+    """'user:<id>' from a valid bearer token, else None"""
+    from apps.users.authentication import decode_token
+    from rest_framework.exceptions import AuthenticationFailed
+
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    prefix, _, token = auth.partition(' ')
+    if prefix.lower() != 'bearer' or not token:
+        return None
+    try:
+        return f"user:{decode_token(token)['user_id']}"
+    except (AuthenticationFailed, KeyError):
+        return None
+
+
+class RateLimitMiddleware:
+    """Apply RATE_LIMITS to requests for the named URLs"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.policies = {
+            name: [Policy(name, index, **spec) for index, spec in enumerate(specs)]
+            for name, specs in settings.RATE_LIMITS.items()
+        }
+        if settings.RATE_LIMIT_BACKEND == 'cache':
+            self.backend = CacheBackend(settings.RATE_LIMIT_CACHE_ALIAS)
+        else:
+            self.backend = LocalBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        policies = self.policies.get(request.resolver_match.url_name)
+        if not policies:
+            return None
+
+        now = time.time()
+        ip = None
+        user = False  # Not looked up yet
+        for policy in policies:
+            if policy.methods is not None and request.method not in policy.methods:
+                continue
+            if policy.key == 'user':
+                if user is False:
+                    user = user_key(request)
+                subject = user
+            else:
+                subject = None
+            if subject is None:
+                if ip is None:
+                    ip = 'ip:' + client_ip(request)
+                subject = ip
+
+            wait = self.backend.take(f'{policy.prefix}:{subject}', policy.rate, policy.burst, now)
+            if wait:
+                increment('ratelimit_rejected')
+                response = JsonResponse({'error': 'Too many requests'}, status=429)
+                response['Retry-After'] = str(max(1, math.ceil(wait)))
+                return response
+        return None
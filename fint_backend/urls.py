@@ -5,11 +5,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import health_check
+from apps.receipts.media import signed_media
+from .views import health_check, metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/health', health_check, name='health_check'),
+    path('api/metrics', metrics, name='metrics'),
+    path('api/media/<path:path>', signed_media, name='signed_media'),
     path('api/auth/', include('apps.users.urls')),
     path('api/receipts/', include('apps.receipts.urls')),
     path('api/stats/', include('apps.receipts.stats_urls')),
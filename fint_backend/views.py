@@ -1,9 +1,12 @@
 """
 Health check and utility views
 """
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from datetime import datetime
 
+from . import metrics as metrics_registry
+
 
 def health_check(request):
     """Health check endpoint"""
@@ -11,3 +14,10 @@ def health_check(request):
         'status': 'healthy',
         'timestamp': datetime.now().isoformat()
     })
+
+
+def metrics(request):
+    """Metrics for the worker process serving the request"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return JsonResponse(metrics_registry.snapshot())
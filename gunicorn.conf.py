@@ -8,7 +8,11 @@ backlog = 2048
 
 # Worker processes
 workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
-worker_class = 'sync'
+# Threads keep serving other requests while some wait on slow work such as
+# password hashing. With 'sync' workers (one request at a time) the hashing
+# pool's bound is never reached and brings no benefit.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
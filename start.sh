@@ -32,6 +32,17 @@ if [ "$MODE" = "production" ]; then
     # Seed data
     python3 seed_data.py
     
+    # Background workers for budget alerts and export jobs, stopped with the
+    # server. Set RUN_WORKERS=false when they run elsewhere (e.g. their own
+    # containers); alerts are then evaluated inline unless
+    # BUDGET_ALERTS_ASYNC=True is set for a worker running somewhere else.
+    if [ "${RUN_WORKERS:-true}" = "true" ]; then
+        export BUDGET_ALERTS_ASYNC=${BUDGET_ALERTS_ASYNC:-True}
+        python3 manage.py run_alert_worker &
+        python3 manage.py run_export_worker &
+        trap 'kill $(jobs -p) 2>/dev/null' EXIT
+    fi
+    
     # Run with Gunicorn
     gunicorn --config gunicorn.conf.py fint_backend.wsgi:application
 else